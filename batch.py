@@ -0,0 +1,265 @@
+"""
+Batch Processing Module
+Encodes many messages into many cover images, and decodes image attachments
+from directories and mail archives, in parallel using a process pool.
+Can be used as a library (encode_batch, decode_batch) or from the command line.
+"""
+
+import argparse
+import io
+import json
+import mailbox
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from steganography import Steganography
+
+
+# File extensions treated as images when walking directories and mail
+IMAGE_EXTENSIONS = ('.png', '.bmp', '.gif', '.tif', '.tiff', '.ppm', '.jpg', '.jpeg')
+
+
+# One engine per worker process, created on first use
+_worker_stego = None
+
+
+def _get_worker_stego():
+    """Return the Steganography instance of the current worker process."""
+    global _worker_stego
+    if _worker_stego is None:
+        _worker_stego = Steganography()
+    return _worker_stego
+
+
+def _init_worker():
+    """Send engine diagnostics to stderr so stdout stays a clean JSONL stream."""
+    sys.stdout = sys.stderr
+
+
+def _normalize_job(job):
+    """Accept a job as a dict or an (image_path, message, output_path[, key[, bits[, profile]]]) sequence."""
+    if isinstance(job, dict):
+        return {
+            'image_path': job['image_path'],
+            'message': job['message'],
+            'output_path': job['output_path'],
+            'encryption_key': job.get('encryption_key'),
+            'bits_per_channel': job.get('bits_per_channel', 1),
+            'output_profile': job.get('output_profile', 'default')
+        }
+    image_path, message, output_path, *rest = job
+    return {
+        'image_path': image_path,
+        'message': message,
+        'output_path': output_path,
+        'encryption_key': rest[0] if rest else None,
+        'bits_per_channel': rest[1] if len(rest) > 1 else 1,
+        'output_profile': rest[2] if len(rest) > 2 else 'default'
+    }
+
+
+def _encode_indexed_job(indexed_job):
+    """Worker entry point: encode a single (index, job) pair and report the outcome."""
+    index, job = indexed_job
+    result = {
+        'index': index,
+        'image_path': job.get('image_path') if isinstance(job, dict) else None,
+        'output_path': job.get('output_path') if isinstance(job, dict) else None,
+        'success': False,
+        'error': None
+    }
+    # A malformed job fails on its own instead of aborting the batch
+    try:
+        job = _normalize_job(job)
+    except KeyError as e:
+        result['error'] = f"Invalid job: missing {e}"
+        return result
+    except (TypeError, ValueError) as e:
+        result['error'] = f"Invalid job: {e}"
+        return result
+    result['image_path'] = job['image_path']
+    result['output_path'] = job['output_path']
+
+    try:
+        _get_worker_stego()._encode(
+            job['image_path'], job['message'], job['output_path'],
+            job['encryption_key'], job['bits_per_channel'],
+            output_profile=job['output_profile']
+        )
+        result['success'] = True
+    except Exception as e:
+        result['error'] = str(e)
+    return result
+
+
+def _decode_item(item, decryption_key):
+    """Worker entry point: decode one image file or attachment and report the outcome."""
+    result = {
+        'source': item['source'],
+        'mail_key': item.get('mail_key'),
+        'attachment': item.get('attachment'),
+        'message': None,
+        'error': None
+    }
+    image = item['path'] if 'path' in item else io.BytesIO(item['data'])
+    try:
+        result['message'] = _get_worker_stego()._decode(image, decryption_key)
+    except Exception as e:
+        result['error'] = str(e)
+    return result
+
+
+def _run_pool(fn, items, workers, *args):
+    """
+    Run fn(item, *args) over items in a process pool, yielding results as
+    they complete. At most a few tasks per worker are in flight, so large
+    inputs such as mail archives are never held in memory all at once.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_pending = workers * 4
+    items = iter(items)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        pending = set()
+        for item in items:
+            pending.add(executor.submit(fn, item, *args))
+            if len(pending) >= max_pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+def _is_image_name(name):
+    """Check whether a file name has an image extension."""
+    return bool(name) and name.lower().endswith(IMAGE_EXTENSIONS)
+
+
+def _iter_attachments(source, mailbox_obj):
+    """Yield image attachments of every message in a mailbox."""
+    for key, message in mailbox_obj.iteritems():
+        for part in message.walk():
+            if part.is_multipart():
+                continue
+            filename = part.get_filename()
+            # The sender attaches images as application/octet-stream, so the
+            # file name is as important as the content type here
+            if part.get_content_maintype() != 'image' and not _is_image_name(filename):
+                continue
+            data = part.get_payload(decode=True)
+            if data:
+                yield {'source': source, 'mail_key': str(key), 'attachment': filename, 'data': data}
+
+
+def iter_sources(path):
+    """
+    Yield decode items from a directory tree, a Maildir, an mbox file or a
+    single image file.
+
+    Args:
+        path (str): Directory, Maildir, mbox file or image path
+
+    Yields:
+        dict: source, optional mail_key and attachment, and either a file
+            path or the attachment bytes
+    """
+    if os.path.isdir(path):
+        if all(os.path.isdir(os.path.join(path, sub)) for sub in ('cur', 'new', 'tmp')):
+            yield from _iter_attachments(path, mailbox.Maildir(path, create=False))
+            return
+        for root, _, files in os.walk(path):
+            for name in sorted(files):
+                if _is_image_name(name):
+                    file_path = os.path.join(root, name)
+                    yield {'source': file_path, 'path': file_path}
+    elif _is_image_name(path):
+        yield {'source': path, 'path': path}
+    else:
+        yield from _iter_attachments(path, mailbox.mbox(path, create=False))
+
+
+def decode_batch(path, decryption_key=None, workers=None):
+    """
+    Decode every image in a directory or mail archive in parallel.
+
+    Args:
+        path (str): Directory, Maildir, mbox file or image path
+        decryption_key (str): Optional decryption key for encrypted messages
+        workers (int): Number of worker processes (defaults to the CPU count)
+
+    Yields:
+        dict: source, mail_key, attachment, message (None if no message was
+            found or it could not be decrypted) and error
+    """
+    yield from _run_pool(_decode_item, iter_sources(path), workers, decryption_key)
+
+
+def encode_batch(jobs, workers=None):
+    """
+    Encode many messages in parallel, yielding results as they complete.
+
+    Args:
+        jobs (iterable): Dicts with image_path, message, output_path and
+            optional encryption_key, bits_per_channel and output_profile, or
+            tuples in that order
+        workers (int): Number of worker processes (defaults to the CPU count)
+
+    Yields:
+        dict: index of the job, image_path, output_path, success and error
+    """
+    # Jobs are validated in the workers, so one bad job only fails its own result
+    indexed = enumerate(jobs)
+    yield from _run_pool(_encode_indexed_job, indexed, workers)
+
+
+def _read_jsonl(path):
+    """Read one JSON object per non-empty line from a file or '-' for stdin."""
+    stream = sys.stdin if path == '-' else open(path, 'r', encoding='utf-8')
+    try:
+        return [json.loads(line) for line in stream if line.strip()]
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Batch steganography operations")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    encode_parser = subparsers.add_parser(
+        'encode', help="Encode jobs from a JSONL file (image_path, message, output_path, encryption_key)"
+    )
+    encode_parser.add_argument('jobs', help="JSONL job file, or - for stdin")
+    encode_parser.add_argument('-w', '--workers', type=int, default=None, help="Number of worker processes")
+
+    decode_parser = subparsers.add_parser(
+        'decode', help="Decode images in a directory, Maildir, mbox file or single image"
+    )
+    decode_parser.add_argument('path', help="Directory, Maildir, mbox file or image")
+    decode_parser.add_argument('-k', '--key', default=None, help="Decryption key")
+    decode_parser.add_argument('-w', '--workers', type=int, default=None, help="Number of worker processes")
+    decode_parser.add_argument('--found-only', action='store_true', help="Only print images that held a message")
+
+    args = parser.parse_args(argv)
+
+    failures = 0
+    if args.command == 'encode':
+        for result in encode_batch(_read_jsonl(args.jobs), workers=args.workers):
+            failures += not result['success']
+            print(json.dumps(result), flush=True)
+    else:
+        for result in decode_batch(args.path, args.key, workers=args.workers):
+            failures += result['error'] is not None
+            if args.found_only and result['message'] is None:
+                continue
+            print(json.dumps(result, ensure_ascii=False), flush=True)
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
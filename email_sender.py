@@ -1,27 +1,272 @@
 """
 Email Module
 Handles sending encoded images via SMTP with Gmail integration.
+Authenticated SMTP sessions are pooled and reused across sends, and
+AsyncEmailSender drives sends from asyncio or a background thread.
 """
 
+import asyncio
+import atexit
+import base64
+import hashlib
 import smtplib
 import ssl
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.image import MIMEImage
 from email.mime.base import MIMEBase
-from email import encoders
+from email.utils import make_msgid
 import os
 from datetime import datetime
 
 
+class SMTPConnectionPool:
+    """
+    Pool of logged-in SMTP sessions, keyed by (server, port, account).
+    
+    Idle sessions are checked with NOOP before reuse and closed once they have
+    been idle for longer than max_idle seconds, so a dropped connection is
+    replaced by a fresh one without the caller noticing. The password is part
+    of the key (as a SHA-256 digest), so a session is only reused for the
+    credentials it was opened with.
+    """
+    
+    def __init__(self, max_idle=120, max_per_key=2, timeout=30):
+        self.max_idle = max_idle
+        self.max_per_key = max_per_key
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self._idle = {}
+        self._lock = threading.Lock()
+    
+    def _key(self, server, port, email, password, use_tls):
+        """Build the pool key for one account on one server."""
+        digest = hashlib.sha256(password.encode()).hexdigest()
+        return (server, port, email, digest, use_tls)
+    
+    def _connect(self, server, port, email, password, use_tls):
+        """Open, secure and authenticate a new SMTP session."""
+        connection = smtplib.SMTP(server, port, timeout=self.timeout)
+        try:
+            if use_tls:
+                connection.starttls(context=ssl.create_default_context())  # Enable security
+            connection.login(email, password)
+        except Exception:
+            self._close(connection)
+            raise
+        return connection
+    
+    def _close(self, connection):
+        """Close a session, ignoring errors from one that already dropped."""
+        try:
+            connection.quit()
+        except Exception:
+            try:
+                connection.close()
+            except Exception:
+                pass
+    
+    def _is_alive(self, connection):
+        """Check an idle session with NOOP."""
+        try:
+            return connection.noop()[0] == 250
+        except Exception:
+            return False
+    
+    def acquire(self, server, port, email, password, use_tls=True):
+        """
+        Take an authenticated session for an account, reusing an idle one if possible.
+        
+        Returns:
+            tuple: (pool key, SMTP connection) to hand back to release or discard
+        """
+        key = self._key(server, port, email, password, use_tls)
+        while True:
+            with self._lock:
+                sessions = self._idle.get(key)
+                connection, idle_since = sessions.pop() if sessions else (None, None)
+            if connection is None:
+                break
+            if time.monotonic() - idle_since <= self.max_idle and self._is_alive(connection):
+                with self._lock:
+                    self.hits += 1
+                return key, connection
+            self._close(connection)
+        
+        with self._lock:
+            self.misses += 1
+        return key, self._connect(server, port, email, password, use_tls)
+    
+    def release(self, key, connection):
+        """Return a healthy session to the pool."""
+        with self._lock:
+            sessions = self._idle.setdefault(key, [])
+            if len(sessions) < self.max_per_key:
+                sessions.append((connection, time.monotonic()))
+                return
+        self._close(connection)
+    
+    def discard(self, connection):
+        """Close a session that may be in an unknown state instead of pooling it."""
+        self._close(connection)
+    
+    def close_all(self):
+        """Close every idle session."""
+        with self._lock:
+            sessions = [connection for entries in self._idle.values() for connection, _ in entries]
+            self._idle.clear()
+        for connection in sessions:
+            self._close(connection)
+    
+    def stats(self):
+        """Return reuse counters and the number of idle sessions for monitoring."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'idle': sum(len(entries) for entries in self._idle.values())
+            }
+
+
+class SMTPDeliveryUncertain(smtplib.SMTPException):
+    """
+    The connection failed after the message data went out, so the server may
+    already have accepted the message. Such a send is never retried.
+    """
+
+
+def is_transient_error(error):
+    """
+    Check whether a failed send is worth retrying later.
+    
+    Network errors before the message data went out are transient. A send
+    that failed after the server received the message data may already have
+    been delivered, so it never counts as transient.
+    """
+    if isinstance(error, SMTPDeliveryUncertain):
+        return False
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        # Retry only if every recipient was deferred rather than rejected
+        return all(400 <= code < 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        # Dropped before DATA; a drop after DATA is SMTPDeliveryUncertain
+        return True
+    if isinstance(error, (smtplib.SMTPException, ssl.SSLCertVerificationError)):
+        # Protocol errors and an untrusted certificate do not fix themselves
+        return False
+    # Being offline: DNS failures, unreachable networks, refused connections, timeouts
+    return isinstance(error, OSError)
+
+
+# Shared by every EmailSender so sessions survive across sends and windows
+smtp_pool = SMTPConnectionPool()
+atexit.register(smtp_pool.close_all)
+
+
+class StreamingMessage:
+    """
+    Email with one image attachment, generated in chunks for the SMTP DATA command.
+    
+    The attachment is read and base64-encoded ATTACHMENT_CHUNK bytes at a
+    time while the message is sent, instead of being read whole, encoded
+    into the MIME tree and then copied again by as_string. Sending a file
+    therefore holds only one chunk of it in memory; in-memory images are
+    not copied. The source is read from its start position on every pass,
+    so a message can be generated again when a send is retried.
+    """
+    
+    # Raw bytes per chunk; a multiple of 57 so every chunk ends on a full 76-character line
+    ATTACHMENT_CHUNK = 57 * 1024
+    
+    def __init__(self, sender_email, recipient_email, image, subject, body, filename):
+        self.image = image
+        self._start = image.tell() if hasattr(image, 'seekable') and image.seekable() else None
+        
+        # Everything but the attachment data is small, so it is built with the
+        # email package around a placeholder that marks where the data goes
+        placeholder = make_msgid().strip('<>')
+        msg = MIMEMultipart()
+        msg['From'] = sender_email
+        msg['To'] = recipient_email if isinstance(recipient_email, str) else ', '.join(recipient_email)
+        msg['Subject'] = subject
+        msg.attach(MIMEText(body, 'plain'))
+        
+        part = MIMEBase('application', 'octet-stream')
+        part['Content-Transfer-Encoding'] = 'base64'
+        part.add_header(
+            'Content-Disposition',
+            f'attachment; filename= {filename}',
+        )
+        part.set_payload(placeholder)
+        msg.attach(part)
+        
+        text = msg.as_bytes(policy=msg.policy.clone(linesep='\r\n'))
+        head, tail = text.split(placeholder.encode())
+        self._head = self._quote_periods(head)
+        self._tail = self._quote_periods(tail)
+        if not self._tail.endswith(b"\r\n"):
+            self._tail += b"\r\n"
+    
+    def _quote_periods(self, data):
+        """Dot-stuff lines starting with a period, as SMTP DATA requires."""
+        data = data.replace(b"\r\n.", b"\r\n..")
+        return b"." + data if data.startswith(b".") else data
+    
+    def _iter_attachment(self):
+        """Yield the raw attachment bytes in ATTACHMENT_CHUNK pieces."""
+        if hasattr(self.image, 'read'):
+            if self._start is not None:
+                self.image.seek(self._start)
+            source, close = self.image, False
+        else:
+            source, close = open(self.image, 'rb'), True
+        try:
+            pending = b""
+            while True:
+                data = source.read(self.ATTACHMENT_CHUNK - len(pending))
+                if not data:
+                    break
+                pending += data
+                # Short reads are topped up so chunks stay line-aligned
+                if len(pending) == self.ATTACHMENT_CHUNK:
+                    yield pending
+                    pending = b""
+            if pending:
+                yield pending
+        finally:
+            if close:
+                source.close()
+    
+    def iter_chunks(self):
+        """Yield the complete message as CRLF-terminated, dot-stuffed bytes."""
+        yield self._head
+        for data in self._iter_attachment():
+            # Base64 output never contains a period, so no stuffing is needed
+            yield base64.encodebytes(data).replace(b"\n", b"\r\n")
+        yield self._tail
+    
+    def as_bytes(self):
+        """Return the whole message at once, for callers that need it in memory."""
+        return b"".join(self.iter_chunks())
+
+
 class EmailSender:
-    def __init__(self):
+    def __init__(self, pool=None):
         self.smtp_server = "smtp.gmail.com"
         self.smtp_port = 587
+        self.use_tls = True
+        self.pool = pool if pool is not None else smtp_pool
         
     def send_encoded_image(self, sender_email, sender_password, recipient_email, 
                           image_path, subject="Secret Image Message", 
-                          body="Please find the attached image."):
+                          body="Please find the attached image.", filename=None):
         """
         Send an encoded image via email.
         
@@ -29,9 +274,10 @@ class EmailSender:
             sender_email (str): Sender's email address
             sender_password (str): Sender's app password
             recipient_email (str): Recipient's email address
-            image_path (str): Path to the encoded image
+            image_path: Path to the encoded image, or a file-like object holding it
             subject (str): Email subject
             body (str): Email body text
+            filename (str): Attachment name; defaults to the image file name
             
         Returns:
             bool: True if successful, False otherwise
@@ -41,45 +287,10 @@ class EmailSender:
             if not all([sender_email, sender_password, recipient_email, image_path]):
                 raise ValueError("All email parameters are required")
             
-            if not os.path.exists(image_path):
-                raise ValueError("Image file does not exist")
-            
-            # Create message
-            msg = MIMEMultipart()
-            msg['From'] = sender_email
-            msg['To'] = recipient_email
-            msg['Subject'] = subject
+            email_message = self._build_message(sender_email, recipient_email, image_path, subject, body, filename)
             
-            # Add body to email
-            msg.attach(MIMEText(body, 'plain'))
-            
-            # Attach the encoded image
-            with open(image_path, "rb") as attachment:
-                part = MIMEBase('application', 'octet-stream')
-                part.set_payload(attachment.read())
-            
-            # Encode file in ASCII characters to send by email
-            encoders.encode_base64(part)
-            
-            # Add header as key/value pair to attachment part
-            filename = os.path.basename(image_path)
-            part.add_header(
-                'Content-Disposition',
-                f'attachment; filename= {filename}',
-            )
-            
-            # Attach the part to message
-            msg.attach(part)
-            
-            # Create SMTP session
-            server = smtplib.SMTP(self.smtp_server, self.smtp_port)
-            server.starttls()  # Enable security
-            server.login(sender_email, sender_password)
-            
-            # Send email
-            text = msg.as_string()
-            server.sendmail(sender_email, recipient_email, text)
-            server.quit()
+            # Send email over a pooled session
+            self._send(sender_email, sender_password, recipient_email, email_message)
             
             return True
             
@@ -96,6 +307,218 @@ class EmailSender:
             print(f"Error sending email: {str(e)}")
             return False
     
+    def _build_message(self, sender_email, recipient_email, image_path, subject, body, filename=None):
+        """
+        Build the MIME message carrying an encoded image as an attachment.
+        
+        Returns:
+            StreamingMessage: The message, generated chunk by chunk while it is sent
+        """
+        in_memory = hasattr(image_path, 'read')
+        if not in_memory and not os.path.exists(image_path):
+            raise ValueError("Image file does not exist")
+        
+        if filename is None:
+            filename = os.path.basename(image_path) if not in_memory else "secret_image.png"
+        return StreamingMessage(sender_email, recipient_email, image_path, subject, body, filename)
+    
+    def _send(self, sender_email, sender_password, recipient_email, email_message):
+        """
+        Send a message over a pooled session.
+        
+        A session that drops between its NOOP check and the DATA command is
+        replaced and the message sent once more; after any other error,
+        including a drop once DATA was accepted, the session is closed rather
+        than returned to the pool.
+        """
+        for attempt in range(2):
+            key, server = self.pool.acquire(self.smtp_server, self.smtp_port,
+                                            sender_email, sender_password, self.use_tls)
+            try:
+                self._transmit(server, sender_email, recipient_email, email_message)
+            except smtplib.SMTPServerDisconnected:
+                self.pool.discard(server)
+                if attempt:
+                    raise
+                continue
+            except Exception:
+                self.pool.discard(server)
+                raise
+            self.pool.release(key, server)
+            return
+    
+    def _transmit(self, server, sender_email, recipient_email, message):
+        """
+        Send a StreamingMessage over an open session.
+        
+        Follows smtplib's sendmail, except that the DATA section is written
+        chunk by chunk as the message generates it. A connection lost before
+        the server accepted DATA raises SMTPServerDisconnected and is safe to
+        resend; one lost afterwards raises SMTPDeliveryUncertain.
+        
+        Returns:
+            dict: Refused recipients, address -> (code, reply), as from sendmail
+        """
+        recipients = [recipient_email] if isinstance(recipient_email, str) else list(recipient_email)
+        server.ehlo_or_helo_if_needed()
+        
+        code, reply = server.mail(sender_email)
+        if code != 250:
+            self._reset(server)
+            raise smtplib.SMTPSenderRefused(code, reply, sender_email)
+        
+        refused = {}
+        for recipient in recipients:
+            code, reply = server.rcpt(recipient)
+            if code not in (250, 251):
+                refused[recipient] = (code, reply)
+        if len(refused) == len(recipients):
+            self._reset(server)
+            raise smtplib.SMTPRecipientsRefused(refused)
+        
+        code, reply = server.docmd("data")
+        if code != 354:
+            self._reset(server)
+            raise smtplib.SMTPDataError(code, reply)
+        # From here on the server may accept the message at any moment, so a
+        # dropped connection must not make callers send it again
+        try:
+            for chunk in message.iter_chunks():
+                server.send(chunk)
+            server.send(b".\r\n")
+            code, reply = server.getreply()
+        except smtplib.SMTPServerDisconnected as e:
+            server.close()
+            raise SMTPDeliveryUncertain(
+                f"Connection lost after the message data was sent; it may have been delivered ({e})"
+            ) from e
+        if code != 250:
+            self._reset(server)
+            raise smtplib.SMTPDataError(code, reply)
+        return refused
+    
+    def _reset(self, server):
+        """Abort the current transaction, ignoring a session that already dropped."""
+        try:
+            server.rset()
+        except smtplib.SMTPServerDisconnected:
+            pass
+    
+    def send_batch(self, messages, max_sessions=4):
+        """
+        Send many encoded images, reusing one authenticated session per sender.
+        
+        Messages are grouped by sender account. Each group is split over up to
+        max_sessions sessions, every session sends its share back to back,
+        and all sessions run in parallel up to max_sessions at a time.
+        
+        Args:
+            messages (iterable): Dicts with sender_email, sender_password,
+                recipient_email (an address or a list of addresses) and image
+                (path or file-like object), plus optional subject, body and filename
+            max_sessions (int): Maximum number of SMTP sessions open at once
+            
+        Returns:
+            list: One dict per message, in input order, with index,
+                sender_email, recipient_email, delivered (accepted addresses),
+                refused (address -> server reply) and error (None on success)
+        """
+        messages = list(messages)
+        results = [None] * len(messages)
+        
+        # Group by account, then deal each group's messages out to its sessions
+        groups = {}
+        for index, message in enumerate(messages):
+            groups.setdefault((message['sender_email'], message['sender_password']), []).append(index)
+        lanes = []
+        for (sender_email, sender_password), indices in groups.items():
+            sessions = min(max_sessions, len(indices))
+            for lane in range(sessions):
+                lanes.append((sender_email, sender_password, indices[lane::sessions]))
+        
+        def run_lane(lane):
+            sender_email, sender_password, indices = lane
+            for index, result in self._send_lane(sender_email, sender_password,
+                                                 [(i, messages[i]) for i in indices]):
+                results[index] = result
+        
+        with ThreadPoolExecutor(max_workers=max(1, min(max_sessions, len(lanes)))) as executor:
+            list(executor.map(run_lane, lanes))
+        
+        return results
+    
+    def _send_lane(self, sender_email, sender_password, indexed_messages):
+        """
+        Send a sequence of messages from one account over a single pooled session.
+        
+        Yields:
+            tuple: (message index, result dict)
+        """
+        key = server = None
+        for position, (index, message) in enumerate(indexed_messages):
+            result = self._new_result(index, sender_email, message)
+            recipients = message['recipient_email']
+            recipients = [recipients] if isinstance(recipients, str) else list(recipients)
+            try:
+                email_message = self._build_message(
+                    sender_email, recipients, message['image'],
+                    message.get('subject', "Secret Image Message"),
+                    message.get('body', "Please find the attached image."),
+                    message.get('filename')
+                )
+                for attempt in range(2):
+                    if server is None:
+                        try:
+                            key, server = self.pool.acquire(self.smtp_server, self.smtp_port,
+                                                            sender_email, sender_password, self.use_tls)
+                        except Exception as e:
+                            # Every remaining message of this account would fail the same way
+                            for index, message in indexed_messages[position:]:
+                                yield index, self._new_result(index, sender_email, message, str(e))
+                            return
+                    try:
+                        refused = self._transmit(server, sender_email, recipients, email_message)
+                        break
+                    except smtplib.SMTPServerDisconnected:
+                        # Dropped before DATA was accepted: reconnect and send once more
+                        self.pool.discard(server)
+                        server = None
+                        if attempt:
+                            raise
+                result['refused'] = self._format_refused(refused)
+                result['delivered'] = [addr for addr in recipients if addr not in refused]
+            except smtplib.SMTPRecipientsRefused as e:
+                result['refused'] = self._format_refused(e.recipients)
+                result['error'] = "All recipients were refused."
+            except (smtplib.SMTPSenderRefused, smtplib.SMTPDataError) as e:
+                # smtplib has reset the transaction, so the session stays usable
+                result['error'] = str(e)
+            except Exception as e:
+                result['error'] = str(e)
+                if server is not None and not isinstance(e, ValueError):
+                    # The session is in an unknown state; the next message reconnects
+                    self.pool.discard(server)
+                    server = None
+            yield index, result
+        
+        if server is not None:
+            self.pool.release(key, server)
+    
+    def _new_result(self, index, sender_email, message, error=None):
+        """Build an empty delivery result for one batch message."""
+        return {
+            'index': index,
+            'sender_email': sender_email,
+            'recipient_email': message['recipient_email'],
+            'delivered': [],
+            'refused': {},
+            'error': error
+        }
+    
+    def _format_refused(self, refused):
+        """Turn smtplib's {address: (code, reply)} into {address: 'code reply'}."""
+        return {addr: f"{code} {reply.decode(errors='replace')}" for addr, (code, reply) in refused.items()}
+    
     def validate_email(self, email):
         """
         Basic email validation.
@@ -122,16 +545,157 @@ class EmailSender:
             bool: True if connection successful, False otherwise
         """
         try:
-            server = smtplib.SMTP(self.smtp_server, self.smtp_port)
-            server.starttls()
-            server.login(email, password)
-            server.quit()
+            # A successful login is kept in the pool for the first send
+            key, server = self.pool.acquire(self.smtp_server, self.smtp_port, email, password, self.use_tls)
+            self.pool.release(key, server)
             return True
         except Exception as e:
             print(f"Connection test failed: {str(e)}")
             return False
 
 
+class AsyncEmailSender:
+    """
+    asyncio front-end to EmailSender.
+    
+    smtplib is blocking, so every send runs on a worker thread and shares the
+    SMTP session pool of the wrapped EmailSender. A semaphore bounds how many
+    sends run at once, each attempt is limited to timeout seconds, and
+    transient failures (network errors before the message data went out, 4xx
+    replies) are retried with exponential backoff. send_encoded_image can be
+    awaited from any event loop; send_in_background schedules it from plain
+    threads, such as a Tk callback, on a loop the sender runs in its own
+    daemon thread.
+    """
+    
+    def __init__(self, sender=None, max_concurrency=4, timeout=60, retries=2, backoff=1.0):
+        self.sender = sender if sender is not None else EmailSender()
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="smtp-send")
+        self._semaphores = weakref.WeakKeyDictionary()  # One limit per event loop
+        self._loop = None
+        self._lock = threading.Lock()
+    
+    async def send_encoded_image(self, sender_email, sender_password, recipient_email,
+                                 image_path, subject="Secret Image Message",
+                                 body="Please find the attached image.", filename=None):
+        """
+        Send an encoded image via email without blocking the event loop.
+        
+        Takes the same arguments as EmailSender.send_encoded_image.
+        
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        try:
+            await self._deliver(sender_email, sender_password, recipient_email,
+                                image_path, subject, body, filename)
+            return True
+            
+        except smtplib.SMTPAuthenticationError:
+            print("Authentication failed. Please check your email and app password.")
+            return False
+        except smtplib.SMTPRecipientsRefused:
+            print("Recipient email address is invalid.")
+            return False
+        except smtplib.SMTPException as e:
+            print(f"SMTP error occurred: {str(e)}")
+            return False
+        except Exception as e:
+            print(f"Error sending email: {str(e)}")
+            return False
+    
+    async def _deliver(self, sender_email, sender_password, recipient_email,
+                       image_path, subject, body, filename):
+        """Build and send one message, retrying transient failures; raises on failure."""
+        if not all([sender_email, sender_password, recipient_email, image_path]):
+            raise ValueError("All email parameters are required")
+        
+        loop = asyncio.get_running_loop()
+        async with self._semaphore(loop):
+            # Checking the image file is blocking I/O as well; the attachment is read while sending
+            email_message = await loop.run_in_executor(
+                self._executor, self.sender._build_message,
+                sender_email, recipient_email, image_path, subject, body, filename
+            )
+            for attempt in range(self.retries + 1):
+                send = loop.run_in_executor(self._executor, self.sender._send,
+                                            sender_email, sender_password, recipient_email, email_message)
+                done, _ = await asyncio.wait({send}, timeout=self.timeout)
+                if not done:
+                    # The worker thread may still complete the send, so a
+                    # timeout is never retried to avoid duplicate messages.
+                    # Socket timeouts inside the send are not caught here and
+                    # go through the transient check below.
+                    send.cancel()
+                    raise SMTPDeliveryUncertain(
+                        f"Sending timed out after {self.timeout} seconds; it may still be delivered"
+                    )
+                try:
+                    send.result()
+                    return
+                except Exception as e:
+                    # A send that may already have been accepted
+                    # (SMTPDeliveryUncertain) is never transient
+                    if attempt == self.retries or not is_transient_error(e):
+                        raise
+                await asyncio.sleep(self.backoff * 2 ** attempt)
+    
+    def _semaphore(self, loop):
+        """Return the concurrency limit of one event loop."""
+        with self._lock:
+            semaphore = self._semaphores.get(loop)
+            if semaphore is None:
+                semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+            return semaphore
+    
+    def send_in_background(self, *args, **kwargs):
+        """
+        Schedule send_encoded_image from any thread.
+        
+        Returns:
+            concurrent.futures.Future: Resolves to the bool result of the send
+        """
+        coroutine = self.send_encoded_image(*args, **kwargs)
+        return asyncio.run_coroutine_threadsafe(coroutine, self._background_loop())
+    
+    def deliver_in_background(self, sender_email, sender_password, recipient_email,
+                              image_path, subject="Secret Image Message",
+                              body="Please find the attached image.", filename=None):
+        """
+        Schedule a send from any thread, keeping the reason it failed.
+        
+        Takes the same arguments as send_encoded_image.
+        
+        Returns:
+            concurrent.futures.Future: Resolves to None once the message is
+                sent, or raises the error of the failed send; callers can
+                check it with is_transient_error before queueing a retry
+        """
+        coroutine = self._deliver(sender_email, sender_password, recipient_email,
+                                  image_path, subject, body, filename)
+        return asyncio.run_coroutine_threadsafe(coroutine, self._background_loop())
+    
+    def _background_loop(self):
+        """Start the sender's own event loop thread on first use."""
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="smtp-loop", daemon=True).start()
+            return self._loop
+    
+    def close(self):
+        """Stop the background loop and the worker threads."""
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is not None:
+            loop.call_soon_threadsafe(loop.stop)
+        self._executor.shutdown(wait=False)
+
+
 # Test function
 if __name__ == "__main__":
     sender = EmailSender()
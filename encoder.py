@@ -1,51 +1,25 @@
 import os
-from PIL import Image
+from steganography import Steganography
+
+# Shared engine; embedding is vectorized and only touches the rows the payload needs
+_stego = Steganography()
 
 def encode_message(image_path, secret_message):
     """Encodes a secret message into an image using LSB steganography."""
-    try:
-        # Open the image
-        img = Image.open(image_path, 'r')
-        width, height = img.size
-        # The image must be a copy to be modified
-        encoded_img = img.copy()
-        
-        # Convert message to binary and add a delimiter to know where the message ends
-        binary_message = ''.join([format(ord(i), "08b") for i in secret_message]) + "1111111111111110"
-        
-        # Check if the image can hold the message
-        if len(binary_message) > width * height * 3:
-            raise ValueError("Image is too small to hold the secret message.")
-            
-        # Create a pixel map for modification
-        pixels = encoded_img.load()
-        data_index = 0
-        
-        # Iterate over each pixel
-        for y in range(height):
-            for x in range(width):
-                # Get the RGB values of the current pixel
-                r, g, b = pixels[x, y]
-                
-                # Encode bits into each color channel (R, G, B)
-                if data_index < len(binary_message):
-                    pixels[x, y] = (r & 0b11111110 | int(binary_message[data_index], 2), g, b)
-                    data_index += 1
-                if data_index < len(binary_message):
-                    pixels[x, y] = (r, g & 0b11111110 | int(binary_message[data_index], 2), b)
-                    data_index += 1
-                if data_index < len(binary_message):
-                    pixels[x, y] = (r, g, b & 0b11111110 | int(binary_message[data_index], 2))
-                    data_index += 1
-                    
-        return encoded_img
-        
-    except FileNotFoundError:
+    if isinstance(image_path, (str, os.PathLike)) and not os.path.exists(image_path):
         print(f"Error: The file at {image_path} was not found.")
         return None
-    except Exception as e:
-        print(f"An error occurred during encoding: {e}")
+    # The engine works on a copy, checks that the image can hold the message
+    # and reports any error itself, returning None
+    return _stego.encode_image(image_path, secret_message)
+
+def decode_message(image_path):
+    """Decodes a secret message hidden in an image by encode_message."""
+    if isinstance(image_path, (str, os.PathLike)) and not os.path.exists(image_path):
+        print(f"Error: The file at {image_path} was not found.")
         return None
+    # Only the rows holding the header and payload are decoded
+    return _stego.decode_message(image_path)
 
 if __name__ == '__main__':
     cover_image_path = "cover_image.png"  # Replace with your image file
@@ -55,4 +29,5 @@ if __name__ == '__main__':
     if stego_image:
         stego_image_path = "stego_image.png"
         stego_image.save(stego_image_path)
-        print(f"Message successfully encoded and saved to {stego_image_path}")
\ No newline at end of file
+        print(f"Message successfully encoded and saved to {stego_image_path}")
+        print(f"Decoded message: {decode_message(stego_image_path)}")
\ No newline at end of file
@@ -0,0 +1,238 @@
+"""
+Outbound Mail Queue Module
+Keeps encoded images that still have to be emailed in an SQLite outbox, so a
+failed send never loses the encoding work. Queued messages are retried with
+exponential backoff and jitter and delivered by a pool of worker threads.
+
+App passwords are never written to disk: the outbox stores only the message,
+and credentials are handed to drain/start and kept in memory.
+"""
+
+import io
+import os
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email_sender import EmailSender, is_transient_error
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    sender_email TEXT NOT NULL,
+    recipient_email TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    body TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    attachment BLOB NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL,
+    claimed_at REAL NOT NULL DEFAULT 0,
+    last_error TEXT,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt);
+"""
+
+# Message states: waiting to be sent, leased to a worker, delivered, given up on
+PENDING, SENDING, SENT, FAILED = 'pending', 'sending', 'sent', 'failed'
+
+
+class OutboundQueue:
+    """
+    Durable outbox of encoded images waiting to be emailed.
+
+    Every message is committed to SQLite before the first delivery attempt.
+    A transient failure (dropped connection, 4xx reply) schedules another
+    attempt after base_delay * 2**attempts seconds, capped at max_delay and
+    jittered so that queued messages do not retry in lockstep; permanent
+    failures and messages out of attempts are marked failed and kept for
+    inspection. Sent messages keep their row but drop the attachment.
+
+    Several processes can share one outbox: a worker leases the messages it
+    sends, and a message is only taken over by another worker once its lease
+    of lease seconds has expired, as happens when its process stopped mid-send.
+    """
+
+    def __init__(self, path='outbox.db', sender=None, max_attempts=8, base_delay=30, max_delay=3600,
+                 lease=900):
+        self.path = path
+        self.sender = sender if sender is not None else EmailSender()
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.lease = lease
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._worker = None
+
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._db:
+            self._db.executescript(SCHEMA)
+            columns = [row[1] for row in self._db.execute("PRAGMA table_info(outbox)")]
+            if 'claimed_at' not in columns:
+                # Outboxes created before leases; their claims count as expired
+                self._db.execute("ALTER TABLE outbox ADD COLUMN claimed_at REAL NOT NULL DEFAULT 0")
+
+    def enqueue(self, sender_email, recipient_email, image, subject="Secret Image Message",
+                body="Please find the attached image.", filename=None):
+        """
+        Store a message in the outbox for delivery.
+
+        Args:
+            sender_email (str): Sender's email address
+            recipient_email (str): Recipient's email address
+            image: Encoded image as bytes, a file-like object or a path
+            subject (str): Email subject
+            body (str): Email body text
+            filename (str): Attachment name; defaults to the image file name
+
+        Returns:
+            int: Id of the queued message
+        """
+        if isinstance(image, (bytes, bytearray, memoryview)):
+            attachment = bytes(image)
+        elif hasattr(image, 'getvalue'):
+            attachment = image.getvalue()
+        elif hasattr(image, 'read'):
+            attachment = image.read()
+        else:
+            with open(image, 'rb') as f:
+                attachment = f.read()
+            filename = filename or os.path.basename(image)
+
+        now = time.time()
+        with self._lock, self._db:
+            cursor = self._db.execute(
+                "INSERT INTO outbox (sender_email, recipient_email, subject, body, filename, "
+                "attachment, next_attempt, created) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (sender_email, recipient_email, subject, body, filename or "secret_image.png",
+                 sqlite3.Binary(attachment), now, now)
+            )
+            return cursor.lastrowid
+
+    def _claim_due(self, senders, limit):
+        """Lease up to limit due messages from the given senders, and return their ids."""
+        if not senders:
+            return []
+        placeholders = ', '.join('?' * len(senders))
+        now = time.time()
+        with self._lock, self._db:
+            # Take the write lock before reading, so two processes never lease the same message
+            self._db.execute("BEGIN IMMEDIATE")
+            ids = [row[0] for row in self._db.execute(
+                f"SELECT id FROM outbox WHERE sender_email IN ({placeholders}) AND "
+                f"((status = ? AND next_attempt <= ?) OR (status = ? AND claimed_at <= ?)) "
+                f"ORDER BY next_attempt LIMIT ?",
+                (*senders, PENDING, now, SENDING, now - self.lease, limit)
+            )]
+            self._db.executemany("UPDATE outbox SET status = ?, claimed_at = ? WHERE id = ?",
+                                 [(SENDING, now, message_id) for message_id in ids])
+        return ids
+
+    def _retry_delay(self, attempts):
+        """Backoff before the next attempt: exponential, capped, with jitter."""
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def _deliver(self, message_id, credentials):
+        """Attempt one leased message and record the outcome; returns its new status."""
+        # Attachments are loaded one message at a time, not for a whole batch of leases
+        with self._lock:
+            sender_email, recipient_email, subject, body, filename, attachment, attempts = self._db.execute(
+                "SELECT sender_email, recipient_email, subject, body, filename, attachment, attempts "
+                "FROM outbox WHERE id = ?", (message_id,)
+            ).fetchone()
+        attempts += 1
+        try:
+            email_message = self.sender._build_message(sender_email, recipient_email, io.BytesIO(attachment),
+                                                       subject, body, filename)
+            self.sender._send(sender_email, credentials[sender_email], recipient_email, email_message)
+            status, next_attempt, error = SENT, 0, None
+        except Exception as e:
+            error = str(e)
+            if is_transient_error(e) and attempts < self.max_attempts:
+                status, next_attempt = PENDING, time.time() + self._retry_delay(attempts)
+            else:
+                status, next_attempt = FAILED, 0
+
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE outbox SET status = ?, attempts = ?, next_attempt = ?, last_error = ? WHERE id = ?",
+                (status, attempts, next_attempt, error, message_id)
+            )
+            if status == SENT:
+                # The image is no longer needed once delivered
+                self._db.execute("UPDATE outbox SET attachment = X'' WHERE id = ?", (message_id,))
+        return status
+
+    def drain(self, credentials, workers=4):
+        """
+        Attempt every message that is due, in parallel.
+
+        Args:
+            credentials (dict): Sender email -> app password; messages from
+                other senders are left in the outbox
+            workers (int): Number of concurrent deliveries
+
+        Returns:
+            dict: Number of messages sent, rescheduled and failed in this pass
+        """
+        counts = {SENT: 0, PENDING: 0, FAILED: 0}
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while True:
+                ids = self._claim_due(list(credentials), workers * 4)
+                if not ids:
+                    break
+                for status in executor.map(lambda message_id: self._deliver(message_id, credentials), ids):
+                    counts[status] += 1
+        return {'sent': counts[SENT], 'retrying': counts[PENDING], 'failed': counts[FAILED]}
+
+    def start(self, credentials, workers=2, poll_interval=5):
+        """
+        Keep draining the outbox in a background thread until stop is called.
+
+        The credentials dict is read on every pass, so senders added to it
+        later are picked up without restarting the worker.
+        """
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive():
+                return
+            self._stop.clear()
+            self._worker = threading.Thread(
+                target=self._run, args=(credentials, workers, poll_interval), name="outbox", daemon=True
+            )
+            self._worker.start()
+
+    def _run(self, credentials, workers, poll_interval):
+        """Background worker loop."""
+        while not self._stop.is_set():
+            try:
+                self.drain(credentials, workers)
+            except Exception as e:
+                print(f"Outbox error: {str(e)}")
+            self._stop.wait(poll_interval)
+
+    def stop(self):
+        """Stop the background worker after its current pass."""
+        self._stop.set()
+        worker = self._worker
+        if worker is not None:
+            worker.join()
+
+    def stats(self):
+        """Return the number of messages in each state."""
+        with self._lock:
+            rows = self._db.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall()
+        counts = {PENDING: 0, SENDING: 0, SENT: 0, FAILED: 0}
+        counts.update(dict(rows))
+        return counts
+
+    def close(self):
+        """Stop the worker and close the database."""
+        self.stop()
+        with self._lock:
+            self._db.close()
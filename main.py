@@ -6,10 +6,10 @@ Integrates steganography and email functionality with a user-friendly interface.
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
 import os
-import tempfile
 from datetime import datetime
 from steganography import Steganography
-from email_sender import EmailSender
+from email_sender import EmailSender, AsyncEmailSender, is_transient_error
+from mail_queue import OutboundQueue
 
 
 class SecureMessagingApp:
@@ -22,6 +22,12 @@ class SecureMessagingApp:
         # Initialize modules
         self.stego = Steganography()
         self.email_sender = EmailSender()
+        self.async_sender = AsyncEmailSender(self.email_sender)
+        self.outbox = OutboundQueue(sender=self.email_sender)
+        self.outbox_credentials = {}  # Kept in memory only, never in the outbox
+        # Messages left over from an earlier run are sent once their sender's
+        # password is known again, after a successful send or connection test
+        self.outbox.start(self.outbox_credentials)
         
         # Variables
         self.selected_image_path = tk.StringVar()
@@ -222,6 +228,7 @@ class SecureMessagingApp:
         self.root.update()
         
         if self.email_sender.test_connection(email, password):
+            self.outbox_credentials[email] = password
             self.status_label.config(text="Connection successful!", fg='green')
             messagebox.showinfo("Success", "Email connection test successful!")
         else:
@@ -254,62 +261,78 @@ class SecureMessagingApp:
             messagebox.showerror("Error", "Invalid recipient email format")
             return
             
-        # Create temporary file for encoded image
-        temp_dir = tempfile.gettempdir()
+        # The encoded image is kept in memory and attached straight from there
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        encoded_image_path = os.path.join(temp_dir, f"secret_image_{timestamp}.png")
+        attachment_name = f"secret_image_{timestamp}.png"
         
         try:
             # Encode message with encryption
             self.status_label.config(text="Encoding and encrypting message...", fg='orange')
             self.root.update()
             
-            success = self.stego.encode_message(
+            encoded_image = self.stego.encode_to_bytes(
                 self.selected_image_path.get(),
                 message,
-                encoded_image_path,
-                encryption_key  # Pass encryption key
+                encryption_key,  # Pass encryption key
+                output_profile='small'  # Smallest attachment to send
             )
             
-            if not success:
+            if encoded_image is None:
                 messagebox.showerror("Error", "Failed to encode message in image")
                 return
                 
-            # Send email
+            # Send email on a background thread so a slow server cannot freeze the window
             self.status_label.config(text="Sending email...", fg='orange')
-            self.root.update()
             
-            success = self.email_sender.send_encoded_image(
-                self.sender_email.get(),
+            outgoing = {
+                'sender_email': self.sender_email.get(),
+                'recipient_email': self.recipient_email.get(),
+                'image': encoded_image,
+                'subject': "Secret Image Message",
+                'body': "Please find the attached image with a hidden message. Use the decode feature to extract it.",
+                'filename': attachment_name
+            }
+            future = self.async_sender.deliver_in_background(
+                outgoing['sender_email'],
                 self.sender_password.get(),
-                self.recipient_email.get(),
-                encoded_image_path,
-                "Secret Image Message",
-                "Please find the attached image with a hidden message. Use the decode feature to extract it."
+                outgoing['recipient_email'],
+                encoded_image,
+                outgoing['subject'],
+                outgoing['body'],
+                filename=attachment_name
             )
-            
-            if success:
-                self.status_label.config(text="Secret message sent successfully!", fg='green')
-                messagebox.showinfo("Success", "Secret message sent successfully!")
-                
-                # Clear form
-                self.message_text.delete("1.0", tk.END)
-                self.recipient_email.set("")
-            else:
-                self.status_label.config(text="Failed to send message", fg='red')
-                messagebox.showerror("Error", "Failed to send email")
+            self.root.after(100, self.finish_send, future, outgoing, self.sender_password.get())
                 
         except Exception as e:
             self.status_label.config(text="Error occurred", fg='red')
             messagebox.showerror("Error", f"An error occurred: {str(e)}")
-        finally:
-            # Clean up temporary file
-            if os.path.exists(encoded_image_path):
-                try:
-                    os.remove(encoded_image_path)
-                except:
-                    pass
                     
+    def finish_send(self, future, outgoing, password):
+        """Report the result of a background send once it completes."""
+        if not future.done():
+            self.root.after(100, self.finish_send, future, outgoing, password)
+            return
+            
+        error = future.exception()
+        if error is None:
+            self.outbox_credentials[outgoing['sender_email']] = password
+            self.status_label.config(text="Secret message sent successfully!", fg='green')
+            messagebox.showinfo("Success", "Secret message sent successfully!")
+            
+            # Clear form
+            self.message_text.delete("1.0", tk.END)
+            self.recipient_email.set("")
+        elif is_transient_error(error):
+            # Keep the encoded image in the outbox so the send is retried, not lost
+            self.outbox.enqueue(**outgoing)
+            self.outbox_credentials[outgoing['sender_email']] = password
+            self.status_label.config(text="Send failed; message queued for retry", fg='orange')
+            messagebox.showwarning("Queued", f"Failed to send email ({str(error)}). The encoded image was saved "
+                                             "to the outbox and will be retried automatically.")
+        else:
+            self.status_label.config(text="Failed to send email", fg='red')
+            messagebox.showerror("Error", f"Failed to send email: {str(error)}")
+            
     def decode_secret_message(self):
         """Decode secret message from image."""
         image_path = self.decode_image_path.get()
@@ -0,0 +1,240 @@
+"""
+Streaming PNG Module
+Reads and writes 8-bit RGB/RGBA PNG files one scanline at a time, so covers
+far larger than available memory can be re-encoded with bounded memory use,
+and payloads can be read from the first rows without decoding the rest.
+"""
+
+import struct
+import zlib
+import numpy as np
+
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# Bytes per pixel for the supported 8-bit color types (RGB, RGBA)
+COLOR_TYPE_BPP = {2: 3, 6: 4}
+
+# Maximum bytes handed to or returned by zlib in one call
+READ_CHUNK = 64 * 1024
+IDAT_CHUNK = 256 * 1024
+
+
+def _read_chunk_header(fp):
+    """Read a chunk's length and type, or (None, None) at end of file."""
+    data = fp.read(8)
+    if len(data) < 8:
+        return None, None
+    return struct.unpack(">I4s", data)
+
+
+def read_header(fp):
+    """
+    Read the signature and IHDR chunk of a PNG stream.
+
+    Args:
+        fp (file): Binary file object positioned at the start of the PNG
+
+    Returns:
+        dict: width, height, color_type and bpp (bytes per pixel)
+    """
+    if fp.read(8) != PNG_SIGNATURE:
+        raise ValueError("Not a PNG file.")
+
+    length, chunk_type = _read_chunk_header(fp)
+    if chunk_type != b"IHDR":
+        raise ValueError("PNG file does not start with an IHDR chunk.")
+    width, height, bit_depth, color_type, _, _, interlace = struct.unpack(">IIBBBBB", fp.read(length))
+    fp.read(4)  # CRC
+
+    if bit_depth != 8 or color_type not in COLOR_TYPE_BPP or interlace:
+        raise ValueError("Streaming requires an 8-bit, non-interlaced RGB or RGBA PNG.")
+    if not width or not height:
+        raise ValueError("PNG image has no pixels.")
+
+    return {
+        'width': width,
+        'height': height,
+        'color_type': color_type,
+        'bpp': COLOR_TYPE_BPP[color_type]
+    }
+
+
+def iter_image_data(fp):
+    """
+    Yield the decompressed, still-filtered image data of a PNG stream in
+    bounded pieces. The stream must be positioned just after IHDR.
+    """
+    decompressor = zlib.decompressobj()
+    while True:
+        length, chunk_type = _read_chunk_header(fp)
+        if chunk_type is None or chunk_type == b"IEND":
+            break
+        if chunk_type != b"IDAT":
+            fp.seek(length + 4, 1)  # Skip ancillary chunk and CRC
+            continue
+
+        remaining = length
+        while remaining:
+            data = fp.read(min(remaining, READ_CHUNK))
+            if not data:
+                raise ValueError("PNG file is truncated.")
+            remaining -= len(data)
+            while data:
+                out = decompressor.decompress(data, READ_CHUNK)
+                if out:
+                    yield out
+                data = decompressor.unconsumed_tail
+        fp.read(4)  # CRC
+
+    tail = decompressor.flush()
+    if tail:
+        yield tail
+
+
+class ScanlineReader:
+    """Split filtered image data into scanlines, leaving the rest streamable."""
+
+    def __init__(self, data_iter, stride):
+        self._data = iter(data_iter)
+        self._buffer = bytearray()
+        self._line_size = stride + 1
+
+    def read_line(self):
+        """
+        Read the next scanline.
+
+        Returns:
+            tuple: (filter type, row bytes as a uint8 array)
+        """
+        while len(self._buffer) < self._line_size:
+            data = next(self._data, None)
+            if data is None:
+                raise ValueError("PNG image data ends before the last scanline.")
+            self._buffer += data
+
+        line = np.frombuffer(bytes(self._buffer[:self._line_size]), dtype=np.uint8)
+        del self._buffer[:self._line_size]
+        return int(line[0]), line[1:]
+
+    def iter_remaining(self):
+        """Yield all data after the scanlines read so far, unchanged."""
+        if self._buffer:
+            yield bytes(self._buffer)
+            self._buffer.clear()
+        yield from self._data
+
+
+def unfilter_row(filter_type, row, prev, bpp):
+    """
+    Reverse the PNG filter of one scanline.
+
+    Args:
+        filter_type (int): PNG filter type (0-4)
+        row (ndarray): Filtered row bytes
+        prev (ndarray): Reconstructed previous row (zeros for the first row)
+        bpp (int): Bytes per pixel
+
+    Returns:
+        ndarray: Reconstructed row bytes
+    """
+    if filter_type == 0:
+        return row.copy()
+    if filter_type == 1:
+        # Sub: running sum along each channel, wrapping at 256
+        return np.cumsum(row.reshape(-1, bpp), axis=0, dtype=np.uint8).reshape(-1)
+    if filter_type == 2:
+        return row + prev
+
+    if filter_type not in (3, 4):
+        raise ValueError(f"Unknown PNG filter type {filter_type}.")
+
+    # Average and Paeth depend on the reconstructed left byte, so they are
+    # resolved byte by byte; plain ints are several times faster here than
+    # NumPy calls on bpp-sized vectors
+    out = bytearray(row.tobytes())
+    above = prev.tobytes()
+    for i in range(bpp):
+        # No left or upper-left neighbours: Average uses half of up, Paeth up itself
+        out[i] = (out[i] + (above[i] >> 1 if filter_type == 3 else above[i])) & 0xFF
+    if filter_type == 3:
+        for i in range(bpp, len(out)):
+            out[i] = (out[i] + ((out[i - bpp] + above[i]) >> 1)) & 0xFF
+    else:
+        for i in range(bpp, len(out)):
+            left, up, upper_left = out[i - bpp], above[i], above[i - bpp]
+            pa = abs(up - upper_left)
+            pb = abs(left - upper_left)
+            pc = abs(left + up - 2 * upper_left)
+            if pa <= pb and pa <= pc:
+                predictor = left
+            elif pb <= pc:
+                predictor = up
+            else:
+                predictor = upper_left
+            out[i] = (out[i] + predictor) & 0xFF
+
+    return np.frombuffer(out, dtype=np.uint8)
+
+
+class PngWriter:
+    """Write a PNG file incrementally from filtered scanline data."""
+
+    def __init__(self, fp, width, height, color_type, compress_level=6):
+        self.fp = fp
+        self._compressor = zlib.compressobj(compress_level)
+        self._pending = bytearray()
+
+        fp.write(PNG_SIGNATURE)
+        self._write_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, color_type, 0, 0, 0))
+
+    def _write_chunk(self, chunk_type, data):
+        """Write one chunk with its length and CRC."""
+        self.fp.write(struct.pack(">I", len(data)))
+        self.fp.write(chunk_type)
+        self.fp.write(data)
+        self.fp.write(struct.pack(">I", zlib.crc32(chunk_type + data) & 0xFFFFFFFF))
+
+    def _flush_idat(self, final=False):
+        """Emit buffered compressed data as IDAT chunks."""
+        while len(self._pending) >= IDAT_CHUNK or (final and self._pending):
+            data = bytes(self._pending[:IDAT_CHUNK])
+            del self._pending[:IDAT_CHUNK]
+            self._write_chunk(b"IDAT", data)
+
+    def write_row(self, row, filter_type=0):
+        """Write one scanline with the given filter type byte."""
+        self.write_data(bytes([filter_type]) + row.tobytes())
+
+    def write_data(self, data):
+        """Write already-filtered image data (filter bytes included)."""
+        self._pending += self._compressor.compress(data)
+        self._flush_idat()
+
+    def close(self):
+        """Finish the image data stream and write IEND."""
+        self._pending += self._compressor.flush()
+        self._flush_idat(final=True)
+        self._write_chunk(b"IEND", b"")
+
+
+def read_prefix_rows(fp, rows):
+    """
+    Decode only the first rows of a PNG stream.
+
+    Returns:
+        tuple: (RGB pixel array of shape (rows, width, 3), (width, height))
+    """
+    header = read_header(fp)
+    width, height, bpp = header['width'], header['height'], header['bpp']
+    rows = min(rows, height)
+    stride = width * bpp
+
+    prev = np.zeros(stride, dtype=np.uint8)
+    strip = np.empty((rows, width, 3), dtype=np.uint8)
+    reader = ScanlineReader(iter_image_data(fp), stride)
+    for y in range(rows):
+        filter_type, line = reader.read_line()
+        prev = unfilter_row(filter_type, line, prev, bpp)
+        strip[y] = prev.reshape(width, bpp)[:, :3]
+    return strip, (width, height)
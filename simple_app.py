@@ -11,86 +11,28 @@ from datetime import datetime
 import hashlib
 import json
 
-# Simple steganography without external dependencies
+# Simple steganography front-end over the shared Steganography engine
 class SimpleSteganography:
     def __init__(self):
         self.max_message_length = 500
+        self._engine = None
+    
+    def _get_engine(self):
+        """Create the shared Steganography engine on first use."""
+        if self._engine is None:
+            # Imported lazily so the GUI can start without the imaging libraries
+            from steganography import Steganography
+            self._engine = Steganography()
+        return self._engine
     
     def encode_message(self, image_path, message, output_path):
         """Simple LSB encoding without encryption for testing."""
-        try:
-            from PIL import Image
-            import numpy as np
-            
-            # Open image
-            image = Image.open(image_path)
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
-            
-            img_array = np.array(image)
-            
-            # Add delimiter
-            message += "###END###"
-            
-            # Convert to binary
-            binary_message = ''.join(format(ord(char), '08b') for char in message)
-            
-            # Check size
-            total_pixels = img_array.shape[0] * img_array.shape[1] * 3
-            if len(binary_message) > total_pixels:
-                raise ValueError("Image too small for message")
-            
-            # Encode
-            flat_img = img_array.flatten()
-            for i, bit in enumerate(binary_message):
-                if i < len(flat_img):
-                    flat_img[i] = (flat_img[i] & 0xFE) | int(bit)
-            
-            img_array = flat_img.reshape(img_array.shape)
-            encoded_image = Image.fromarray(img_array.astype(np.uint8))
-            encoded_image.save(output_path)
-            
-            return True
-            
-        except Exception as e:
-            print(f"Encoding error: {e}")
-            return False
+        # Shares the payload format of the main application
+        return self._get_engine().encode_message(image_path, message, output_path)
     
     def decode_message(self, image_path):
         """Simple LSB decoding."""
-        try:
-            from PIL import Image
-            import numpy as np
-            
-            image = Image.open(image_path)
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
-            
-            img_array = np.array(image)
-            flat_img = img_array.flatten()
-            
-            # Extract LSBs
-            binary_message = ""
-            for pixel in flat_img:
-                binary_message += str(pixel & 1)
-            
-            # Convert to text
-            message = ""
-            for i in range(0, len(binary_message), 8):
-                if i + 8 <= len(binary_message):
-                    byte = binary_message[i:i+8]
-                    char = chr(int(byte, 2))
-                    message += char
-                    
-                    if message.endswith("###END###"):
-                        message = message[:-9]
-                        break
-            
-            return message
-            
-        except Exception as e:
-            print(f"Decoding error: {e}")
-            return None
+        return self._get_engine().decode_message(image_path)
 
 
 class SimpleMessagingApp:
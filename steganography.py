@@ -2,52 +2,533 @@
 LSB Steganography Module
 Handles encoding and decoding of secret messages in images using Least Significant Bit technique.
 Includes encryption/decryption with user keys for additional security.
+
+This is the single stego engine used by every front-end (main.py, main_enhanced.py,
+main_vscode.py, simple_app.py, encoder.py and batch.py). Its public API is the
+Steganography class: encode_message, encode_image, encode_to_bytes,
+encode_message_streaming, decode_message, decode_from_bytes, probe, capacity,
+payload_size and select_cover.
 """
 
 from PIL import Image
 import numpy as np
 import os
 import hashlib
+import io
 from cryptography.fernet import Fernet
 import base64
+import bz2
+import lzma
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+import png_stream
+
+# Every encoded image starts with this header in its first LSBs:
+# magic, format version, flags, payload length and CRC32 of the payload.
+HEADER_STRUCT = struct.Struct(">4sBBII")
+HEADER_MAGIC = b"STGM"
+HEADER_BITS = HEADER_STRUCT.size * 8
+FORMAT_VERSION = 1
+
+# Header flag bits
+FLAG_ENCRYPTED = 0x01
+FLAG_RAW_TOKEN = 0x02  # Encrypted payload is the binary Fernet token, not base64 text
+COMPRESSION_MASK = 0x0C  # Bits 2-3 hold the compression method id
+COMPRESSION_SHIFT = 2
+BITS_MASK = 0x30  # Bits 4-5 hold the payload bits per channel, minus one
+BITS_SHIFT = 4
+FLAG_SCATTER = 0x40  # Payload channels are spread over the image by a key-seeded permutation
+KNOWN_FLAGS = FLAG_ENCRYPTED | FLAG_RAW_TOKEN | COMPRESSION_MASK | BITS_MASK | FLAG_SCATTER
+
+# Upper bound on the bits per color channel used for the payload
+MAX_BITS_PER_CHANNEL = 4
+
+# Compression methods applied before encryption: id -> (compress, decompressor
+# factory). Id 0 means the message is stored as-is; every message uses
+# whichever of these produces the smallest output.
+COMPRESSORS = {
+    1: (lambda data: zlib.compress(data, 9), zlib.decompressobj),
+    # A 1 MiB dictionary covers any message that fits a cover, without the
+    # 64 MiB of working memory preset 9 would allocate on every encode
+    2: (lambda data: lzma.compress(data, format=lzma.FORMAT_ALONE, filters=[
+        {'id': lzma.FILTER_LZMA1, 'preset': 9, 'dict_size': 1 << 20}
+    ]), lzma.LZMADecompressor),
+    3: (lambda data: bz2.compress(data, 9), bz2.BZ2Decompressor),
+}
+
+# Largest message a payload may decompress to. Payloads come from untrusted
+# attachments, and a few hundred compressed bytes can otherwise expand to
+# hundreds of megabytes.
+MAX_DECOMPRESSED_LENGTH = 16 * 1024 * 1024
+
+# Largest prefix read from a PNG beyond Pillow's pixel limit, counting the
+# scanline buffer. Such images skip Pillow's decompression bomb check, and a
+# single row of a crafted one can otherwise inflate to gigabytes.
+MAX_PREFIX_BYTES = 64 * 1024 * 1024
+
+# Output settings for saved images: name -> (Pillow save options, strip metadata).
+# The output size sets SMTP transfer time, so the 'fast' and 'small' profiles
+# also drop ancillary chunks (ICC profile, text, transparency) carried over
+# from the cover. Measured on a 1920x1080 photo: default 834 ms / 3.53 MB,
+# fast 305 ms / 3.83 MB, small 859 ms / 3.51 MB. Pillow's optimize flag was
+# no smaller than level 9 there, so 'small' uses level 9 alone.
+OUTPUT_PROFILES = {
+    'default': ({}, False),  # Pillow defaults, cover metadata kept
+    'fast': ({'compress_level': 1}, True),  # Lowest latency before sending
+    'small': ({'compress_level': 9}, True),  # Fewest bytes on the wire
+}
+
+# Images written before the header existed end their message with this
+# delimiter; it is only searched for within the first LEGACY_SCAN_LIMIT bytes.
+LEGACY_DELIMITER = b"###END###"
+LEGACY_SCAN_LIMIT = 8192
+
+# Uncompressed pixel layouts that can be memory-mapped straight from the file:
+# Pillow raw mode -> (bytes per pixel, offsets of the R, G and B bytes)
+RAW_LAYOUTS = {
+    'RGB': (3, [0, 1, 2]),
+    'BGR': (3, [2, 1, 0]),
+    'RGBX': (4, [0, 1, 2]),
+    'RGBA': (4, [0, 1, 2]),
+    'BGRX': (4, [2, 1, 0]),
+    'BGRA': (4, [2, 1, 0]),
+}
+
+class CipherCache:
+    """
+    Bounded LRU cache of Fernet cipher objects.
+    
+    Entries are keyed by the SHA-256 digest of the user's key, which is also
+    the Fernet key material, so a hit skips both derivation and construction.
+    """
+    
+    def __init__(self, maxsize=32):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._ciphers = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        """Return the Fernet object for a user key, building it on a miss."""
+        digest = hashlib.sha256(key.encode()).digest()
+        with self._lock:
+            fernet = self._ciphers.get(digest)
+            if fernet is not None:
+                self._ciphers.move_to_end(digest)
+                self.hits += 1
+                return fernet
+            self.misses += 1
+        
+        fernet = Fernet(base64.urlsafe_b64encode(digest))
+        with self._lock:
+            self._ciphers[digest] = fernet
+            self._ciphers.move_to_end(digest)
+            while len(self._ciphers) > self.maxsize:
+                self._ciphers.popitem(last=False)
+        return fernet
+    
+    def invalidate(self, key=None):
+        """Drop the cipher for one key, or every cached cipher if no key is given."""
+        with self._lock:
+            if key is None:
+                self._ciphers.clear()
+            else:
+                self._ciphers.pop(hashlib.sha256(key.encode()).digest(), None)
+    
+    def stats(self):
+        """Return hit/miss counters and current size for monitoring."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._ciphers),
+                'maxsize': self.maxsize
+            }
+
+
+# Shared by all Steganography instances in the process
+cipher_cache = CipherCache()
 
 
 class Steganography:
-    def __init__(self):
-        self.max_message_length = 1000  # Maximum characters for safety
+    def __init__(self, max_message_length=None):
+        # Optional cap on message bytes after compression; by default a message
+        # is limited only by the capacity of the cover at the chosen bits_per_channel
+        self.max_message_length = max_message_length
+        self.max_decompressed_length = MAX_DECOMPRESSED_LENGTH  # Decompression bomb guard
+        self.max_prefix_bytes = MAX_PREFIX_BYTES  # Same, for images beyond Pillow's pixel limit
+        self.cipher_cache = cipher_cache
     
     def _encrypt_message(self, message, key):
-        """Encrypt message using Fernet encryption."""
+        """Encrypt a message (str or bytes) using Fernet encryption, returning the binary token."""
         try:
-            # Create key from user's decryption key
-            key_bytes = hashlib.sha256(key.encode()).digest()
-            fernet_key = base64.urlsafe_b64encode(key_bytes)
-            fernet = Fernet(fernet_key)
-            
-            # Encrypt message
-            encrypted_message = fernet.encrypt(message.encode())
-            return base64.urlsafe_b64encode(encrypted_message).decode()
+            # Cipher derived from the user's key, reused across calls
+            fernet = self.cipher_cache.get(key)
+            
+            # Encrypt message; the token is base64 text, so unwrap it to raw
+            # bytes to avoid spending image capacity on the encoding
+            data = message if isinstance(message, bytes) else message.encode()
+            token = fernet.encrypt(data)
+            return base64.urlsafe_b64decode(token)
         except Exception as e:
             print(f"Encryption error: {str(e)}")
             return None
     
     def _decrypt_message(self, encrypted_message, key):
-        """Decrypt message using Fernet decryption."""
+        """Decrypt message using Fernet decryption, returning text."""
+        decrypted_message = self._decrypt_bytes(encrypted_message, key)
+        return decrypted_message.decode() if decrypted_message is not None else None
+    
+    def _decrypt_bytes(self, encrypted_message, key):
+        """
+        Decrypt message using Fernet decryption, returning bytes.
+        
+        Accepts the binary token as bytes, or the base64 text of a token as
+        str for images written before payloads were stored in binary.
+        """
         try:
-            # Create key from user's decryption key
-            key_bytes = hashlib.sha256(key.encode()).digest()
-            fernet_key = base64.urlsafe_b64encode(key_bytes)
-            fernet = Fernet(fernet_key)
+            # Cipher derived from the user's key, reused across calls
+            fernet = self.cipher_cache.get(key)
+            
+            # Rebuild the Fernet token from the stored payload
+            if isinstance(encrypted_message, bytes):
+                token = base64.urlsafe_b64encode(encrypted_message)
+            else:
+                token = base64.urlsafe_b64decode(encrypted_message.encode())
             
             # Decrypt message
-            encrypted_bytes = base64.urlsafe_b64decode(encrypted_message.encode())
-            decrypted_message = fernet.decrypt(encrypted_bytes)
-            return decrypted_message.decode()
+            return fernet.decrypt(token)
         except Exception as e:
             print(f"Decryption error: {str(e)}")
             return None
     
-    def encode_message(self, image_path, message, output_path, encryption_key=None):
+    def _compress(self, data):
+        """
+        Compress data with whichever registered method gives the smallest result.
+        
+        Returns:
+            tuple: (method id, data), with id 0 if nothing beats the raw bytes
+        """
+        best_method, best_data = 0, data
+        for method, (compress, _) in COMPRESSORS.items():
+            candidate = compress(data)
+            if len(candidate) < len(best_data):
+                best_method, best_data = method, candidate
+        return best_method, best_data
+    
+    def _decompress(self, method, data):
+        """
+        Undo _compress for the method id recorded in the header.
+        
+        Output is capped at max_decompressed_length bytes; a payload that
+        expands beyond that is rejected without being inflated further.
+        """
+        if method == 0:
+            return data
+        if method not in COMPRESSORS:
+            raise ValueError(f"Unknown compression method {method}.")
+        
+        decompressor = COMPRESSORS[method][1]()
+        output = decompressor.decompress(data, self.max_decompressed_length + 1)
+        if len(output) > self.max_decompressed_length:
+            raise ValueError(f"Compressed payload expands beyond {self.max_decompressed_length} bytes.")
+        if not decompressor.eof:
+            raise ValueError("Compressed payload is truncated.")
+        return output
+    
+    def _bytes_to_bits(self, data):
+        """Convert bytes into an array of bits, MSB first per byte."""
+        return np.unpackbits(np.frombuffer(data, dtype=np.uint8))
+    
+    def _channels_needed(self, num_bytes, bits_per_channel=1):
+        """Number of channel values that hold num_bytes at the given bit depth."""
+        return -(-num_bytes * 8 // bits_per_channel)
+    
+    def _pack_values(self, data, bits_per_channel=1):
+        """Group the bits of data into bits_per_channel-wide values, MSB first."""
+        bits = self._bytes_to_bits(data)
+        if bits_per_channel > 1:
+            # Pad to whole groups, then fold each group of bits into one value
+            bits = np.concatenate([bits, np.zeros(-bits.size % bits_per_channel, dtype=np.uint8)])
+            weights = (1 << np.arange(bits_per_channel - 1, -1, -1)).astype(np.uint8)
+            bits = (bits.reshape(-1, bits_per_channel) * weights).sum(axis=1, dtype=np.uint8)
+        return bits
+    
+    def _embed_bytes(self, flat_img, start, data, bits_per_channel=1):
+        """
+        Write data into the low bits of flat_img starting at channel index start.
+        
+        Bits are grouped into bits_per_channel-wide values (MSB first) and
+        written with a single masked array operation.
+        """
+        values = self._pack_values(data, bits_per_channel)
+        stop = start + values.size
+        if stop > flat_img.size:
+            raise ValueError("Image too small to hide the message.")
+        keep_mask = np.uint8((0xFF << bits_per_channel) & 0xFF)
+        flat_img[start:stop] = (flat_img[start:stop] & keep_mask) | values
+    
+    def _read_bytes(self, flat_img, start, num_bytes, bits_per_channel=1):
+        """Read num_bytes from the low bits of flat_img starting at channel index start."""
+        stop = start + self._channels_needed(num_bytes, bits_per_channel)
+        if stop > flat_img.size:
+            raise ValueError("Image too small to hold the requested data.")
+        
+        return self._unpack_values(flat_img[start:stop], num_bytes, bits_per_channel)
+    
+    def _unpack_values(self, channel_values, num_bytes, bits_per_channel=1):
+        """Reassemble num_bytes from the low bits of the given channel values."""
+        values = channel_values & ((1 << bits_per_channel) - 1)
+        if bits_per_channel == 1:
+            return np.packbits(values).tobytes()
+        
+        # Unfold each value into its bits_per_channel low bits, MSB first
+        bits = np.unpackbits(values.astype(np.uint8).reshape(-1, 1), axis=1)[:, 8 - bits_per_channel:]
+        return np.packbits(bits.reshape(-1)[:num_bytes * 8]).tobytes()
+    
+    def _scatter_positions(self, key, count, total_channels):
+        """
+        Channel indices for a key-scattered payload of count channel values.
+        
+        Payload channel j is placed at HEADER_BITS + P(j), where P is a
+        key-seeded permutation of the channels after the header. P is a
+        four-round Feistel network over the smallest even power of two
+        covering the domain, with cycle-walking back into range, evaluated
+        on all indices at once; the full permutation is never materialized
+        and the mapping does not depend on NumPy's random stream.
+        """
+        domain = total_channels - HEADER_BITS
+        if count > domain:
+            raise ValueError("Image too small to hide the message.")
+        
+        half_bits = max((int(domain - 1).bit_length() + 1) // 2, 1)
+        half_mask = np.uint64((1 << half_bits) - 1)
+        shift = np.uint64(half_bits)
+        digest = hashlib.sha256(b"stego-scatter:" + key.encode()).digest()
+        round_keys = [np.uint64(k) for k in struct.unpack(">4Q", digest)]
+        
+        def permute(x):
+            left, right = x >> shift, x & half_mask
+            for round_key in round_keys:
+                # splitmix64-style mixing of the right half with the round key
+                mixed = (right ^ round_key) * np.uint64(0x9E3779B97F4A7C15)
+                mixed ^= mixed >> np.uint64(29)
+                mixed *= np.uint64(0xBF58476D1CE4E5B9)
+                mixed ^= mixed >> np.uint64(32)
+                left, right = right, left ^ (mixed & half_mask)
+            return (left << shift) | right
+        
+        positions = permute(np.arange(count, dtype=np.uint64))
+        out_of_range = positions >= domain
+        while out_of_range.any():
+            positions[out_of_range] = permute(positions[out_of_range])
+            out_of_range = positions >= domain
+        
+        return positions.astype(np.intp) + HEADER_BITS
+    
+    def _pack_header(self, flags, payload):
+        """Build the binary header that precedes every payload."""
+        checksum = zlib.crc32(payload) & 0xFFFFFFFF
+        return HEADER_STRUCT.pack(HEADER_MAGIC, FORMAT_VERSION, flags, len(payload), checksum)
+    
+    def _read_header(self, flat_img, total_channels):
+        """
+        Read and validate the payload header from the first LSBs.
+        
+        Args:
+            flat_img (ndarray): Flattened channel values, at least the header prefix
+            total_channels (int): Channel count of the whole image, for the capacity check
+            
+        Returns:
+            tuple: (flags, length, checksum) or None if no header is present
+        """
+        if flat_img.size < HEADER_BITS:
+            return None
+        
+        magic, version, flags, length, checksum = HEADER_STRUCT.unpack(
+            self._read_bytes(flat_img, 0, HEADER_STRUCT.size)
+        )
+        if magic != HEADER_MAGIC:
+            return None
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported payload format version {version}.")
+        if flags & ~KNOWN_FLAGS:
+            raise ValueError("Payload header contains unknown flags.")
+        bits_per_channel = ((flags & BITS_MASK) >> BITS_SHIFT) + 1
+        if HEADER_BITS + self._channels_needed(length, bits_per_channel) > total_channels:
+            raise ValueError("Payload length in header exceeds image capacity.")
+        
+        return flags, length, checksum
+    
+    def _load_rows(self, image, rows):
+        """
+        Load the top rows of an image, converted to RGB.
+        
+        Pillow decodes the whole image here; only formats without a
+        row-level reader (see _load_prefix) take this path.
+        """
+        width, height = image.size
+        rows = min(rows, height)
+        if rows < height:
+            image = image.crop((0, 0, width, rows))
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        return image
+    
+    def _load_prefix(self, image_path, channels):
+        """
+        Open an image and load only the rows holding its first channel values.
+        
+        Args:
+            image_path: Path, seekable file-like object or already opened PIL Image
+            channels (int): Number of leading channel values required
+            
+        Returns:
+            tuple: (flat read-only channel array, full image size)
+        """
+        if isinstance(image_path, Image.Image):
+            size = image_path.size
+            rows = min(-(-channels // (size[0] * 3)), size[1])
+            strip = image_path.crop((0, 0, size[0], rows)).convert('RGB')
+            return np.asarray(strip).reshape(-1), size
+        
+        # 8-bit RGB/RGBA PNGs are read scanline by scanline, so decoding stops
+        # after the requested rows; this includes gigapixel covers written by
+        # the streaming encoder, which exceed Pillow's pixel limit
+        prefix = self._load_png_prefix(image_path, channels)
+        if prefix is not None:
+            return prefix
+        
+        if hasattr(image_path, 'seek'):
+            image_path.seek(0)
+        image = Image.open(image_path)
+        size = image.size
+        rows = -(-channels // (size[0] * 3))
+        if isinstance(image_path, (str, os.PathLike)):
+            strip = self._map_raw_rows(image, image_path, rows)
+            if strip is not None:
+                image.close()
+                return strip.reshape(-1), size
+        return np.asarray(self._load_rows(image, rows)).reshape(-1), size
+    
+    def _map_raw_rows(self, image, image_path, rows):
+        """
+        Read the top rows of an uncompressed BMP, TIFF or PPM through a memory map.
+        
+        The pixel data of these files sits at a fixed offset, so only the pages
+        holding the requested rows are read from disk (or the page cache), in
+        either row order. Returns None for any layout this does not cover, and
+        the caller decodes through Pillow instead.
+        
+        Returns:
+            ndarray: RGB rows of shape (rows, width, 3), or None
+        """
+        tiles = getattr(image, 'tile', None) or []
+        width, height = image.size
+        if len(tiles) != 1 or image.mode not in ('RGB', 'RGBA'):
+            return None
+        codec, extents, offset, args = tiles[0]
+        if codec != 'raw' or tuple(extents) != (0, 0, width, height):
+            return None
+        
+        args = args if isinstance(args, tuple) else (args,)
+        if args[0] not in RAW_LAYOUTS:
+            return None
+        bpp, channel_order = RAW_LAYOUTS[args[0]]
+        stride = (len(args) > 1 and args[1]) or width * bpp
+        bottom_up = len(args) > 2 and args[2] < 0
+        rows = min(rows, height)
+        
+        # Bottom-up files store the top rows at the end of the pixel data
+        first_row = height - rows if bottom_up else 0
+        try:
+            mapped = np.memmap(image_path, dtype=np.uint8, mode='r',
+                               offset=offset + first_row * stride, shape=(rows, stride))
+        except (ValueError, OSError):
+            # Truncated or unmappable file; let Pillow report it
+            return None
+        
+        pixels = mapped[:, :width * bpp].reshape(rows, width, bpp)
+        if bottom_up:
+            pixels = pixels[::-1]
+        # Fancy indexing copies just these rows out of the map
+        strip = pixels[:, :, channel_order]
+        del mapped, pixels
+        return strip
+    
+    def _beyond_pixel_limit(self, size):
+        """Check whether Pillow would refuse to open an image of this size as a decompression bomb."""
+        return Image.MAX_IMAGE_PIXELS is not None and size[0] * size[1] > 2 * Image.MAX_IMAGE_PIXELS
+    
+    def _load_png_prefix(self, image_path, channels):
+        """
+        Load the leading channel values of a PNG without Pillow.
+        
+        For images beyond Pillow's pixel limit, the rows read (and the
+        scanline buffer) must fit in max_prefix_bytes, since nothing else
+        bounds how much a crafted file inflates to.
+        
+        Returns:
+            tuple: (flat channel array, full image size), or None if the image
+                is not an 8-bit, non-interlaced RGB or RGBA PNG
+        """
+        if hasattr(image_path, 'seek'):
+            image_path.seek(0)
+            fp, close = image_path, False
+        else:
+            fp, close = open(image_path, 'rb'), True
+        try:
+            try:
+                header = png_stream.read_header(fp)
+            except (ValueError, struct.error):
+                # Other formats and PNG layouts are left to Pillow
+                return None
+            fp.seek(0)
+            width, height = header['width'], header['height']
+            rows = -(-channels // (width * 3))
+            prefix_bytes = min(rows, height) * width * header['bpp']
+            if self._beyond_pixel_limit((width, height)) and prefix_bytes > self.max_prefix_bytes:
+                raise Image.DecompressionBombError(
+                    f"Reading {prefix_bytes} bytes of a {width}x{height} image exceeds "
+                    f"the {self.max_prefix_bytes} byte limit."
+                )
+            strip, size = png_stream.read_prefix_rows(fp, rows)
+            return strip.reshape(-1), size
+        finally:
+            if close:
+                fp.close()
+    
+    def _extract_until_delimiter(self, flat_img, delimiter, max_bytes, chunk_bytes=4096):
+        """
+        Read LSBs as bytes until the delimiter is found.
+        
+        Bits are packed with np.packbits one chunk at a time so that only the
+        part of the image holding the message is ever touched. Used for images
+        written before the payload header existed.
+        
+        Returns:
+            bytes: Data before the delimiter, or None if it is not found
+        """
+        usable_bits = min(flat_img.size - flat_img.size % 8, max_bytes * 8)
+        chunk_bits = chunk_bytes * 8
+        data = bytearray()
+        
+        for start in range(0, usable_bits, chunk_bits):
+            chunk = flat_img[start:min(start + chunk_bits, usable_bits)] & 1
+            search_from = max(len(data) - len(delimiter) + 1, 0)
+            data += np.packbits(chunk).tobytes()
+            
+            end = data.find(delimiter, search_from)
+            if end != -1:
+                return bytes(data[:end])
+        
+        return None
+    
+    def encode_message(self, image_path, message, output_path, encryption_key=None, bits_per_channel=1,
+                       scatter=False, output_profile='default'):
         """
         Encode a secret message into an image using LSB steganography.
         
@@ -56,124 +537,520 @@ class Steganography:
             message (str): Secret message to hide
             output_path (str): Path to save the encoded image
             encryption_key (str): Optional encryption key for additional security
+            bits_per_channel (int): Low bits (1-4) of each color channel used for
+                the payload; more bits trade imperceptibility for capacity
+            scatter (bool): Spread the payload over the whole image at positions
+                derived from encryption_key instead of filling it sequentially
+            output_profile (str): Output settings from OUTPUT_PROFILES: 'default',
+                'fast' (quickest save) or 'small' (smallest file)
             
         Returns:
             bool: True if successful, False otherwise
         """
         try:
-            # Open the image
-            image = Image.open(image_path)
-            
-            # Convert to RGB if necessary
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
-            
-            # Convert to numpy array
-            img_array = np.array(image)
-            
-            # Check if message is too long
-            if len(message) > self.max_message_length:
-                raise ValueError(f"Message too long. Maximum {self.max_message_length} characters allowed.")
-            
-            # Encrypt message if key provided
-            if encryption_key:
-                encrypted_message = self._encrypt_message(message, encryption_key)
-                if encrypted_message is None:
-                    raise ValueError("Failed to encrypt message")
-                message = encrypted_message
-            
-            # Add delimiter to mark end of message
-            message += "###END###"
+            self._encode(image_path, message, output_path, encryption_key, bits_per_channel, scatter,
+                         output_profile)
+            return True
             
-            # Convert message to binary
-            binary_message = ''.join(format(ord(char), '08b') for char in message)
+        except Exception as e:
+            print(f"Error encoding message: {str(e)}")
+            return False
+    
+    def _build_payload(self, message, encryption_key=None):
+        """
+        Compress and optionally encrypt a message into the bytes that get embedded.
+        
+        Returns:
+            tuple: (header flags, payload bytes)
+        """
+        data = message.encode('utf-8')
+        if len(data) > self.max_decompressed_length:
+            # Decoders would refuse to expand it
+            raise ValueError(f"Message too long. Maximum {self.max_decompressed_length} bytes allowed.")
+        
+        # Compress before encrypting, as ciphertext does not compress
+        method, payload = self._compress(data)
+        flags = method << COMPRESSION_SHIFT
+        
+        # Check if message is too long
+        if self.max_message_length is not None and len(payload) > self.max_message_length:
+            raise ValueError(f"Message too long. Maximum {self.max_message_length} bytes after compression allowed.")
+        
+        # Encrypt message if key provided
+        if encryption_key:
+            payload = self._encrypt_message(payload, encryption_key)
+            if payload is None:
+                raise ValueError("Failed to encrypt message")
+            flags |= FLAG_ENCRYPTED | FLAG_RAW_TOKEN
+        
+        return flags, payload
+    
+    def _capacity_bytes(self, size, bits_per_channel=1):
+        """Payload bytes that fit in an image of the given (width, height)."""
+        if not 1 <= bits_per_channel <= MAX_BITS_PER_CHANNEL:
+            raise ValueError(f"bits_per_channel must be between 1 and {MAX_BITS_PER_CHANNEL}.")
+        
+        # The header always uses one bit per channel; the payload follows it
+        channels = size[0] * size[1] * 3 - HEADER_BITS
+        return max(channels * bits_per_channel // 8, 0)
+    
+    def encode_image(self, image, message, encryption_key=None, bits_per_channel=1, scatter=False):
+        """
+        Encode a secret message and return the encoded image without saving it.
+        
+        Args:
+            image: Path, file-like object or PIL Image of the original image
+            message (str): Secret message to hide
+            encryption_key (str): Optional encryption key for additional security
+            bits_per_channel (int): Low bits (1-4) of each color channel used for the payload
+            scatter (bool): Spread the payload using positions derived from encryption_key
             
-            # Check if image has enough pixels
-            total_pixels = img_array.shape[0] * img_array.shape[1] * 3
-            if len(binary_message) > total_pixels:
-                raise ValueError("Image too small to hide the message.")
+        Returns:
+            Image: Encoded RGB image, or None if failed
+        """
+        try:
+            return self._encode_image(image, message, encryption_key, bits_per_channel, scatter)
             
-            # Flatten the image array
-            flat_img = img_array.flatten()
+        except Exception as e:
+            print(f"Error encoding message: {str(e)}")
+            return None
+    
+    def _encode(self, image_path, message, output_path, encryption_key=None, bits_per_channel=1,
+                scatter=False, output_profile='default', format=None):
+        """Encode a message as encode_message does, raising on failure."""
+        save_options, strip_metadata = self._output_profile(output_profile)
+        encoded_image = self._encode_image(image_path, message, encryption_key, bits_per_channel, scatter)
+        if strip_metadata:
+            encoded_image.info = {}
+        encoded_image.save(output_path, format, **save_options)
+    
+    def encode_to_bytes(self, image, message, encryption_key=None, bits_per_channel=1, scatter=False,
+                        output_profile='default'):
+        """
+        Encode a secret message entirely in memory, returning the PNG data.
+        
+        Args:
+            image: Path, file-like object, or bytes/bytearray/memoryview of the original image
+            message (str): Secret message to hide
+            encryption_key (str): Optional encryption key for additional security
+            bits_per_channel (int): Low bits (1-4) of each color channel used for the payload
+            scatter (bool): Spread the payload using positions derived from encryption_key
+            output_profile (str): Output settings from OUTPUT_PROFILES
             
-            # Encode message into LSBs
-            for i, bit in enumerate(binary_message):
-                if i < len(flat_img):
-                    # Clear the LSB and set it to our bit
-                    flat_img[i] = (flat_img[i] & 0xFE) | int(bit)
+        Returns:
+            BytesIO: Encoded PNG positioned at the start, or None if failed
+        """
+        try:
+            output = io.BytesIO()
+            self._encode(self._as_image_source(image), message, output, encryption_key, bits_per_channel,
+                         scatter, output_profile, format='PNG')
+            output.seek(0)
+            return output
             
-            # Reshape back to original shape
-            img_array = flat_img.reshape(img_array.shape)
+        except Exception as e:
+            print(f"Error encoding message: {str(e)}")
+            return None
+    
+    def _as_image_source(self, image):
+        """Wrap bytes-like data or an unseekable stream in a file object Pillow can open."""
+        if isinstance(image, (bytes, bytearray, memoryview)):
+            return io.BytesIO(image)
+        if hasattr(image, 'read') and not (hasattr(image, 'seekable') and image.seekable()):
+            return io.BytesIO(image.read())
+        return image
+    
+    def _output_profile(self, output_profile):
+        """Look up the (save options, strip metadata) pair of an output profile."""
+        if output_profile not in OUTPUT_PROFILES:
+            raise ValueError(f"Unknown output profile {output_profile!r}; "
+                             f"choose one of {', '.join(OUTPUT_PROFILES)}.")
+        return OUTPUT_PROFILES[output_profile]
+    
+    def _encode_image(self, image, message, encryption_key=None, bits_per_channel=1, scatter=False):
+        """Encode a message as encode_image does, raising on failure."""
+        if scatter and not encryption_key:
+            raise ValueError("Scatter mode requires an encryption key.")
+        
+        flags, payload = self._build_payload(message, encryption_key)
+        flags |= (bits_per_channel - 1) << BITS_SHIFT
+        if scatter:
+            flags |= FLAG_SCATTER
+        
+        if isinstance(image, Image.Image):
+            # Embedding works in place, so leave the caller's image untouched
+            image = image.copy()
+        else:
+            # Open the image; only the header is read until pixels are needed
+            image = Image.open(image)
+        
+        # Check if image has enough pixels
+        if len(payload) > self._capacity_bytes(image.size, bits_per_channel):
+            raise ValueError("Image too small to hide the message.")
+        
+        # Embed into the image's own pixel buffer
+        return self._embed_into_image(
+            image, flags, payload, bits_per_channel, encryption_key if scatter else None
+        )
+    
+    def _embed_into_image(self, image, flags, payload, bits_per_channel=1, scatter_key=None):
+        """
+        Write the header and payload into an image, touching only the pixels needed.
+        
+        Only the strip of rows that holds the payload is copied into a NumPy
+        array; it is modified through a flat view and pasted back, so no copy
+        of the full frame is made beyond the decoded image itself. With a
+        scatter_key the payload may land anywhere, so the whole frame is used.
+        
+        Returns:
+            Image: The RGB image holding the payload
+        """
+        # Convert to RGB if necessary; this is the only full-frame copy
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        
+        if scatter_key is not None:
+            img_array = np.array(image)
+            flat_img = img_array.reshape(-1)
+            values = self._pack_values(payload, bits_per_channel)
+            positions = self._scatter_positions(scatter_key, values.size, flat_img.size)
+            keep_mask = np.uint8((0xFF << bits_per_channel) & 0xFF)
             
-            # Save the encoded image
-            encoded_image = Image.fromarray(img_array.astype(np.uint8))
-            encoded_image.save(output_path)
+            self._embed_bytes(flat_img, 0, self._pack_header(flags, payload))
+            flat_img[positions] = (flat_img[positions] & keep_mask) | values
+            return Image.fromarray(img_array)
+        
+        width = image.size[0]
+        channels = HEADER_BITS + self._channels_needed(len(payload), bits_per_channel)
+        rows = -(-channels // (width * 3))
+        
+        strip = np.array(image.crop((0, 0, width, rows)))
+        flat_strip = strip.reshape(-1)
+        
+        # Prefix the payload with a header carrying its length and checksum;
+        # the header always uses one bit per channel so it can be read first
+        self._embed_bytes(flat_strip, 0, self._pack_header(flags, payload))
+        self._embed_bytes(flat_strip, HEADER_BITS, payload, bits_per_channel)
+        
+        image.paste(Image.fromarray(strip), (0, 0))
+        return image
+    
+    def encode_message_streaming(self, image_path, message, output_path, encryption_key=None,
+                                 bits_per_channel=1, output_profile='default'):
+        """
+        Encode a secret message into a very large PNG cover with bounded memory.
+        
+        The cover is read and the output written one scanline at a time; only
+        the rows holding the payload are reconstructed and modified, and the
+        remaining image data is recompressed as it streams through. Requires
+        an 8-bit, non-interlaced RGB or RGBA PNG; the output is a PNG of the
+        same color type that decode_message reads like any other. Ancillary
+        chunks of the cover are never copied to the output.
+        
+        Args:
+            image_path (str): Path to the original PNG image
+            message (str): Secret message to hide
+            output_path (str): Path to save the encoded image
+            encryption_key (str): Optional encryption key for additional security
+            bits_per_channel (int): Low bits (1-4) of each color channel used for the payload
+            output_profile (str): Output settings from OUTPUT_PROFILES; only the
+                compression level applies here
             
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        try:
+            self._encode_streaming(image_path, message, output_path, encryption_key, bits_per_channel,
+                                   output_profile)
             return True
             
         except Exception as e:
             print(f"Error encoding message: {str(e)}")
             return False
     
+    def _iter_embed_chunks(self, flags, payload, bits_per_channel, chunk_channels):
+        """
+        Yield the values to embed as (values, keep_mask) chunks of chunk_channels channels.
+        
+        The header occupies one bit per channel and the payload
+        bits_per_channel bits, exactly as in the in-memory encoder.
+        """
+        header_values = self._pack_values(self._pack_header(flags, payload))
+        payload_values = self._pack_values(payload, bits_per_channel)
+        values = np.concatenate([header_values, payload_values])
+        keep = np.concatenate([
+            np.full(header_values.size, 0xFE, dtype=np.uint8),
+            np.full(payload_values.size, (0xFF << bits_per_channel) & 0xFF, dtype=np.uint8)
+        ])
+        for start in range(0, values.size, chunk_channels):
+            yield values[start:start + chunk_channels], keep[start:start + chunk_channels]
+    
+    def _encode_streaming(self, image_path, message, output_path, encryption_key=None, bits_per_channel=1,
+                          output_profile='default'):
+        """Encode a message as encode_message_streaming does, raising on failure."""
+        save_options, _ = self._output_profile(output_profile)
+        flags, payload = self._build_payload(message, encryption_key)
+        flags |= (bits_per_channel - 1) << BITS_SHIFT
+        
+        with open(image_path, 'rb') as src:
+            # Validate the cover before anything is written
+            header = png_stream.read_header(src)
+            if len(payload) > self._capacity_bytes((header['width'], header['height']), bits_per_channel):
+                raise ValueError("Image too small to hide the message.")
+            
+            # Write next to the destination and move it into place only once
+            # complete, so a failed encode never leaves a truncated output and
+            # output_path may even be the cover itself
+            temp_path = f"{output_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                with open(temp_path, 'xb') as dst:
+                    self._stream_embed(src, dst, header, flags, payload, bits_per_channel,
+                                       save_options.get('compress_level', 6))
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+        
+        os.replace(temp_path, output_path)
+    
+    def _stream_embed(self, src, dst, header, flags, payload, bits_per_channel, compress_level):
+        """Copy the PNG image data from src to dst scanline by scanline, embedding the payload."""
+        width, height, bpp = header['width'], header['height'], header['bpp']
+        stride = width * bpp
+        reader = png_stream.ScanlineReader(png_stream.iter_image_data(src), stride)
+        writer = png_stream.PngWriter(dst, width, height, header['color_type'], compress_level)
+        prev = np.zeros(stride, dtype=np.uint8)
+        
+        # Rows holding the payload: reconstruct, embed, write unfiltered
+        for values, keep in self._iter_embed_chunks(flags, payload, bits_per_channel, width * 3):
+            filter_type, line = reader.read_line()
+            prev = unfiltered = png_stream.unfilter_row(filter_type, line, prev, bpp)
+            row = unfiltered.copy()
+            rgb = row.reshape(width, bpp)[:, :3]
+            flat = rgb.reshape(-1)
+            flat[:values.size] = (flat[:values.size] & keep) | values
+            rgb[...] = flat.reshape(width, 3)
+            writer.write_row(row)
+        
+        # The next row may be filtered against the original pixels above
+        # it, so it is rewritten unfiltered; later rows pass through as-is
+        written = -(-(HEADER_BITS + self._channels_needed(len(payload), bits_per_channel)) // (width * 3))
+        if written < height:
+            filter_type, line = reader.read_line()
+            writer.write_row(png_stream.unfilter_row(filter_type, line, prev, bpp))
+        for data in reader.iter_remaining():
+            writer.write_data(data)
+        writer.close()
+    
     def decode_message(self, image_path, decryption_key=None):
         """
         Decode a secret message from an image using LSB steganography.
         
+        Images carrying a payload header are read with a single fixed-size
+        read; older images framed with the ###END### delimiter are still
+        decoded by scanning a bounded prefix of the image.
+        
         Args:
-            image_path (str): Path to the encoded image
+            image_path: Path, file-like object or PIL Image of the encoded image
             decryption_key (str): Optional decryption key for encrypted messages
             
         Returns:
             str: Decoded message or None if failed
         """
         try:
-            # Open the image
-            image = Image.open(image_path)
+            return self._decode(image_path, decryption_key)
             
-            # Convert to RGB if necessary
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
+        except Exception as e:
+            print(f"Error decoding message: {str(e)}")
+            return None
+    
+    def decode_from_bytes(self, data, decryption_key=None):
+        """
+        Decode a secret message from in-memory image data.
+        
+        Args:
+            data: bytes/bytearray/memoryview or file-like object of the encoded image
+            decryption_key (str): Optional decryption key for encrypted messages
             
-            # Convert to numpy array
-            img_array = np.array(image)
+        Returns:
+            str: Decoded message or None if failed
+        """
+        return self.decode_message(self._as_image_source(data), decryption_key)
+    
+    def _decode(self, image_path, decryption_key=None):
+        """Decode a message as decode_message does, raising on malformed payloads."""
+        # Load just enough rows for the header
+        flat_img, size = self._load_prefix(image_path, HEADER_BITS)
+        total_channels = size[0] * size[1] * 3
+        
+        header = self._read_header(flat_img, total_channels)
+        if header is not None:
+            flags, length, checksum = header
+            bits_per_channel = ((flags & BITS_MASK) >> BITS_SHIFT) + 1
             
-            # Flatten the image array
-            flat_img = img_array.flatten()
-            
-            # Extract LSBs
-            binary_message = ""
-            for pixel in flat_img:
-                binary_message += str(pixel & 1)
-            
-            # Convert binary to text
-            message = ""
-            for i in range(0, len(binary_message), 8):
-                if i + 8 <= len(binary_message):
-                    byte = binary_message[i:i+8]
-                    char = chr(int(byte, 2))
-                    message += char
-                    
-                    # Check for end delimiter
-                    if message.endswith("###END###"):
-                        message = message[:-9]  # Remove delimiter
-                        break
-            
-            # Try to decrypt if key provided
-            if decryption_key and message:
-                decrypted_message = self._decrypt_message(message, decryption_key)
-                if decrypted_message is not None:
-                    return decrypted_message
-                else:
-                    # Decryption failed - wrong key or message not encrypted
+            if flags & FLAG_SCATTER:
+                # Positions come from the key, so without it there is nothing to read
+                if not decryption_key:
                     return None
+                # Scattered payloads need the whole frame
+                if self._beyond_pixel_limit(size):
+                    raise ValueError("Image is too large to read a scattered payload from.")
+                flat_img, _ = self._load_prefix(image_path, total_channels)
+                positions = self._scatter_positions(
+                    decryption_key, self._channels_needed(length, bits_per_channel), total_channels
+                )
+                payload = self._unpack_values(flat_img[positions], length, bits_per_channel)
+                if zlib.crc32(payload) & 0xFFFFFFFF != checksum:
+                    # A wrong key reads from the wrong positions
+                    return None
+                return self._open_payload(flags, payload, decryption_key)
+            
+            # Reload with the rows the payload spans, if the header strip is too short
+            needed = HEADER_BITS + self._channels_needed(length, bits_per_channel)
+            if needed > flat_img.size:
+                flat_img, _ = self._load_prefix(image_path, needed)
+            
+            payload = self._read_bytes(flat_img, HEADER_BITS, length, bits_per_channel)
+            if zlib.crc32(payload) & 0xFFFFFFFF != checksum:
+                raise ValueError("Payload checksum mismatch.")
+            return self._open_payload(flags, payload, decryption_key)
+        
+        # Fall back to the legacy delimiter-framed format, which never
+        # extends past the first LEGACY_SCAN_LIMIT bytes
+        flat_img, _ = self._load_prefix(image_path, LEGACY_SCAN_LIMIT * 8)
+        payload = self._extract_until_delimiter(flat_img, LEGACY_DELIMITER, LEGACY_SCAN_LIMIT)
+        if payload is None:
+            return None
+        message = payload.decode('latin-1')
+        
+        # Try to decrypt if key provided
+        if decryption_key and message:
+            decrypted_message = self._decrypt_message(message, decryption_key)
+            if decrypted_message is not None:
+                return decrypted_message
+            else:
+                # Decryption failed - wrong key or message not encrypted
+                return None
+        
+        # If no key provided but message exists, return it (might be unencrypted)
+        return message
+    
+    def _open_payload(self, flags, payload, decryption_key):
+        """Decrypt and decompress a header-framed payload according to its flags."""
+        if flags & FLAG_ENCRYPTED:
+            # Binary tokens are stored raw, older ones as base64 text
+            token = payload if flags & FLAG_RAW_TOKEN else payload.decode('utf-8')
+            if not decryption_key:
+                # Without a key, show the Fernet token itself
+                return base64.urlsafe_b64encode(token).decode() if isinstance(token, bytes) else token
+            payload = self._decrypt_bytes(token, decryption_key)
+            if payload is None:
+                # Decryption failed - wrong key
+                return None
+        
+        method = (flags & COMPRESSION_MASK) >> COMPRESSION_SHIFT
+        return self._decompress(method, payload).decode('utf-8')
+    
+    def probe(self, image_path):
+        """
+        Check whether an image carries a payload without decoding it.
+        
+        Only the rows holding the payload header are loaded, so the cost is
+        roughly constant regardless of image resolution. Images written with
+        the legacy ###END### delimiter are reported as having no payload.
+        
+        Args:
+            image_path (str): Path to the image
+            
+        Returns:
+            dict: has_payload, length, encrypted, bits_per_channel and scattered,
+                or None if failed
+        """
+        try:
+            flat_img, size = self._load_prefix(image_path, HEADER_BITS)
+            header = self._read_header(flat_img, size[0] * size[1] * 3)
+            if header is None:
+                return {
+                    'has_payload': False,
+                    'length': 0,
+                    'encrypted': False,
+                    'bits_per_channel': 0,
+                    'scattered': False
+                }
             
-            # If no key provided but message exists, return it (might be unencrypted)
-            return message
+            flags, length, _ = header
+            return {
+                'has_payload': True,
+                'length': length,
+                'encrypted': bool(flags & FLAG_ENCRYPTED),
+                'bits_per_channel': ((flags & BITS_MASK) >> BITS_SHIFT) + 1,
+                'scattered': bool(flags & FLAG_SCATTER)
+            }
+        except Exception as e:
+            print(f"Error probing image: {str(e)}")
+            return None
+    
+    def capacity(self, image_path, bits_per_channel=1):
+        """
+        Get how many payload bytes an image can hold.
+        
+        Only the image file header is read; no pixel data is decoded.
+        
+        Args:
+            image_path (str): Path to the image
+            bits_per_channel (int): Bits embedded in each color channel
             
+        Returns:
+            int: Payload capacity in bytes, or None if failed
+        """
+        try:
+            with Image.open(image_path) as image:
+                return self._capacity_bytes(image.size, bits_per_channel)
         except Exception as e:
-            print(f"Error decoding message: {str(e)}")
+            print(f"Error getting image capacity: {str(e)}")
             return None
     
+    def payload_size(self, message, encryption_key=None):
+        """
+        Get the exact number of bytes a message will occupy once compressed,
+        encrypted (if a key is given) and framed, excluding the header.
+        
+        Args:
+            message (str): Secret message to hide
+            encryption_key (str): Optional encryption key
+            
+        Returns:
+            int: Payload size in bytes
+        """
+        return len(self._build_payload(message, encryption_key)[1])
+    
+    def select_cover(self, message, cover_paths, encryption_key=None, bits_per_channel=1):
+        """
+        Pick the smallest cover image that can hold a message.
+        
+        Covers are compared by capacity using only their file headers, so
+        large images that are not chosen are never decoded.
+        
+        Args:
+            message (str): Secret message to hide
+            cover_paths (iterable): Candidate image paths
+            encryption_key (str): Optional encryption key
+            bits_per_channel (int): Bits embedded in each color channel
+            
+        Returns:
+            str: Path of the chosen cover, or None if none is large enough
+        """
+        # Encryption is randomized but its output length depends only on the input length
+        needed = self.payload_size(message, encryption_key)
+        
+        best_path, best_capacity = None, None
+        for path in cover_paths:
+            available = self.capacity(path, bits_per_channel)
+            if available is None or available < needed:
+                continue
+            if best_capacity is None or available < best_capacity:
+                best_path, best_capacity = path, available
+        return best_path
+    
     def get_image_info(self, image_path):
         """
         Get information about an image file.
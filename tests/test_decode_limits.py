@@ -0,0 +1,57 @@
+"""
+Images beyond Pillow's pixel limit are read without Pillow's decompression
+bomb check, so the prefix read from them must stay within a fixed budget.
+"""
+
+import numpy as np
+from PIL import Image
+
+import png_stream
+from steganography import Steganography
+
+
+def _write_png(path, width, height):
+    row = (np.arange(width * 3) % 251).astype(np.uint8)
+    with open(path, 'wb') as f:
+        writer = png_stream.PngWriter(f, width, height, 2)
+        for _ in range(height):
+            writer.write_row(row)
+        writer.close()
+
+
+def test_wide_image_beyond_pixel_limit_is_refused(tmp_path, monkeypatch):
+    monkeypatch.setattr(Image, 'MAX_IMAGE_PIXELS', 1000)
+    cover = tmp_path / 'wide.png'
+    _write_png(cover, 1 << 16, 4)
+    stego = Steganography()
+    stego.max_prefix_bytes = 64 * 1024
+
+    assert stego.probe(str(cover)) is None
+    assert stego.decode_message(str(cover)) is None
+
+
+def test_image_beyond_pixel_limit_decodes_within_budget(tmp_path, monkeypatch):
+    cover = tmp_path / 'cover.png'
+    encoded = tmp_path / 'encoded.png'
+    _write_png(cover, 400, 300)
+    stego = Steganography()
+    assert stego.encode_message_streaming(str(cover), "hello", str(encoded), "key")
+
+    monkeypatch.setattr(Image, 'MAX_IMAGE_PIXELS', 1000)
+    stego.max_prefix_bytes = 64 * 1024
+
+    assert stego.probe(str(encoded))['has_payload']
+    assert stego.decode_message(str(encoded), "key") == "hello"
+
+
+def test_scattered_payload_beyond_pixel_limit_is_refused(tmp_path, monkeypatch):
+    cover = tmp_path / 'cover.png'
+    encoded = tmp_path / 'scattered.png'
+    _write_png(cover, 400, 300)
+    stego = Steganography()
+    assert stego.encode_message(str(cover), "hello", str(encoded), "key", scatter=True)
+    assert stego.decode_message(str(encoded), "key") == "hello"
+
+    monkeypatch.setattr(Image, 'MAX_IMAGE_PIXELS', 1000)
+
+    assert stego.decode_message(str(encoded), "key") is None
@@ -0,0 +1,58 @@
+"""
+Peak memory of embedding: only the rows holding the header and payload may
+be copied into NumPy arrays, never the whole frame.
+"""
+
+import tracemalloc
+
+from PIL import Image
+
+from steganography import BITS_SHIFT, Steganography
+
+
+WIDTH, HEIGHT = 4000, 3000  # 12 MP cover; a full RGB frame copy is 36 MB
+FRAME_BYTES = WIDTH * HEIGHT * 3
+
+
+def _make_cover(path):
+    Image.new('RGB', (WIDTH, HEIGHT), (120, 80, 200)).save(path)
+
+
+def _embed_peak(cover, message, encryption_key=None, bits_per_channel=1):
+    """
+    Embed a message into a cover and return (encoded image, traced peak bytes).
+
+    The payload is built before tracing starts: the compressors' working
+    memory does not depend on the cover and is not what is measured here.
+    """
+    stego = Steganography()
+    flags, payload = stego._build_payload(message, encryption_key)
+    flags |= (bits_per_channel - 1) << BITS_SHIFT
+
+    tracemalloc.start()
+    try:
+        encoded = stego._embed_into_image(Image.open(cover), flags, payload, bits_per_channel)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return encoded, peak
+
+
+def test_embedding_peak_memory_is_bounded_by_payload(tmp_path):
+    cover = tmp_path / 'cover.png'
+    _make_cover(cover)
+
+    encoded, peak = _embed_peak(cover, "secret message " * 200, encryption_key="key")
+
+    assert peak < FRAME_BYTES // 20
+    assert Steganography().decode_message(encoded, "key") == "secret message " * 200
+
+
+def test_embedding_peak_memory_with_more_bits_per_channel(tmp_path):
+    cover = tmp_path / 'cover.png'
+    _make_cover(cover)
+
+    encoded, peak = _embed_peak(cover, "x" * 5000, bits_per_channel=4)
+
+    assert peak < FRAME_BYTES // 20
+    assert Steganography().decode_message(encoded) == "x" * 5000
@@ -0,0 +1,52 @@
+"""
+The scanline reader must reconstruct every PNG filter type exactly as Pillow
+does, since probe and decode read PNG prefixes through it.
+"""
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import png_stream
+from steganography import Steganography
+
+
+def _write_random_png(path, width, height, color_type, seed=0):
+    """Write random filtered scanlines with a random filter type per row; any such data is a valid PNG."""
+    rng = np.random.default_rng(seed)
+    stride = width * png_stream.COLOR_TYPE_BPP[color_type]
+    with open(path, 'wb') as f:
+        writer = png_stream.PngWriter(f, width, height, color_type)
+        for _ in range(height):
+            filter_type = int(rng.integers(0, 5))
+            writer.write_data(bytes([filter_type]) + rng.integers(0, 256, stride, dtype=np.uint8).tobytes())
+        writer.close()
+
+
+@pytest.mark.parametrize('color_type', [2, 6])
+def test_prefix_rows_match_pillow(tmp_path, color_type):
+    path = tmp_path / 'random.png'
+    _write_random_png(path, 97, 40, color_type)
+
+    with open(path, 'rb') as f:
+        strip, size = png_stream.read_prefix_rows(f, 25)
+
+    assert size == (97, 40)
+    expected = np.asarray(Image.open(path).convert('RGB'))[:25]
+    assert np.array_equal(strip, expected)
+
+
+def test_png_probe_does_not_decode_through_pillow(tmp_path, monkeypatch):
+    cover = tmp_path / 'cover.png'
+    encoded = tmp_path / 'encoded.png'
+    Image.new('RGB', (300, 200), (120, 80, 200)).save(cover)
+    stego = Steganography()
+    assert stego.encode_message(str(cover), "hello", str(encoded))
+
+    def fail(*args, **kwargs):
+        raise AssertionError("PNG prefix was decoded through Pillow")
+
+    monkeypatch.setattr(Image, 'open', fail)
+
+    assert stego.probe(str(encoded))['has_payload']
+    assert stego.decode_message(str(encoded)) == "hello"
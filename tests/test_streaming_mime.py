@@ -0,0 +1,106 @@
+"""
+Peak memory of sending: a large attachment is streamed through the SMTP DATA
+command one chunk at a time, never read or base64-encoded whole.
+"""
+
+import email
+import os
+import smtplib
+import socketserver
+import threading
+import tracemalloc
+
+from email_sender import EmailSender, StreamingMessage
+
+
+ATTACHMENT_BYTES = 16 * 1024 * 1024
+
+
+class _StubSMTPHandler(socketserver.StreamRequestHandler):
+    """Minimal SMTP server that writes each message to disk line by line."""
+
+    def _reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        self._reply("220 localhost stub")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line[:4].upper()
+            if command in (b"EHLO", b"HELO"):
+                self._reply("250 localhost")
+            elif command in (b"MAIL", b"RCPT", b"RSET", b"NOOP"):
+                self._reply("250 OK")
+            elif command == b"DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                self._receive()
+                self._reply("250 OK")
+            elif command == b"QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("500 Unknown command")
+
+    def _receive(self):
+        with open(self.server.mailbox_path, 'wb') as mailbox:
+            while True:
+                line = self.rfile.readline()
+                if line == b".\r\n":
+                    break
+                # Undo the dot-stuffing of the sender
+                mailbox.write(line[1:] if line.startswith(b"..") else line)
+        self.server.received.set()
+
+
+def _start_stub(mailbox_path):
+    server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), _StubSMTPHandler)
+    server.daemon_threads = True
+    server.mailbox_path = mailbox_path
+    server.received = threading.Event()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _make_attachment(path):
+    data = os.urandom(ATTACHMENT_BYTES)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return data
+
+
+def test_large_attachment_is_streamed(tmp_path):
+    attachment_path = tmp_path / 'encoded.png'
+    attachment = _make_attachment(attachment_path)
+    mailbox_path = tmp_path / 'received.eml'
+    stub = _start_stub(mailbox_path)
+    sender = EmailSender()
+
+    try:
+        message = sender._build_message('a@example.com', 'b@example.com', str(attachment_path),
+                                        "Subject", "Body", 'encoded.png')
+        assert isinstance(message, StreamingMessage)
+        server = smtplib.SMTP('127.0.0.1', stub.server_address[1])
+        try:
+            tracemalloc.start()
+            try:
+                refused = sender._transmit(server, 'a@example.com', 'b@example.com', message)
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+        finally:
+            server.quit()
+        assert stub.received.wait(10)
+    finally:
+        stub.shutdown()
+        stub.server_close()
+
+    assert refused == {}
+    assert peak < ATTACHMENT_BYTES // 16
+
+    with open(mailbox_path, 'rb') as f:
+        received = email.message_from_binary_file(f)
+    parts = [part for part in received.walk() if part.get_filename() == 'encoded.png']
+    assert len(parts) == 1
+    assert parts[0].get_payload(decode=True) == attachment